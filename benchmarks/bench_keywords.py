@@ -0,0 +1,142 @@
+"""关键词分析基准测试
+
+对比逐词 `word in text` 扫描的旧实现与 TextAnalyzer 的单次匹配实现，
+按 generate_ai_post 的调用方式（每条评论提取关键点和情感，每个帖子额外提取
+标签）在合成语料上校验两者结果一致，并输出耗时。
+
+用法：python benchmarks/bench_keywords.py [--comments 5000] [--extra-words 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from v2ex_invest.core import (KEY_POINT_WORDS, NEGATIVE_WORDS, POSITIVE_WORDS, TAG_WORDS,
+                               TextAnalyzer)
+
+FILLER = '我觉得今天这个的了是不在有人也就都而及与着或一个没有我们你们他们 hello world ETF 123'
+
+
+def legacy_extract_key_points(text, important_words):
+    if not text:
+        return []
+    keywords = []
+    for word in important_words:
+        if word in text:
+            keywords.append(word)
+    return keywords[:5]
+
+
+def legacy_analyze_sentiment(text, positive_words, negative_words):
+    if not text:
+        return "neutral"
+    positive_count = sum(1 for word in positive_words if word in text)
+    negative_count = sum(1 for word in negative_words if word in text)
+    if positive_count > negative_count + 2:
+        return "positive"
+    elif negative_count > positive_count + 2:
+        return "negative"
+    else:
+        return "neutral"
+
+
+def legacy_extract_tags(title, content, tag_candidates):
+    tags = []
+    full_text = title + " " + content
+    for tag in tag_candidates:
+        if tag in full_text:
+            tags.append(tag)
+    if not tags:
+        words = full_text.split()
+        important_words = [w for w in words if len(w) > 1 and w.isalnum()]
+        # 旧实现为 list(set(...))[:3]，结果随哈希种子变化；这里按 TextAnalyzer 的约定取出现顺序
+        tags = list(dict.fromkeys(important_words))[:3]
+    return tags
+
+
+def make_corpus(count, words, rng, min_length=5, max_length=200):
+    """生成混有词典词的随机文本"""
+    corpus = []
+    for _ in range(count):
+        parts = [rng.choice(FILLER) for _ in range(rng.randint(min_length, max_length))]
+        for _ in range(rng.randint(0, 6)):
+            parts.insert(rng.randint(0, len(parts)), rng.choice(words))
+        corpus.append(''.join(parts))
+    return corpus
+
+
+def best_of(func, repeat):
+    """运行多次，返回最短耗时和结果"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='关键词分析基准测试')
+    parser.add_argument('--comments', type=int, default=5000, help='合成评论条数')
+    parser.add_argument('--posts', type=int, default=250, help='合成帖子数')
+    parser.add_argument('--extra-words', type=int, default=0, help='额外加入关键词词典的随机词数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    key_point_words = list(KEY_POINT_WORDS)
+    extra = set()
+    while len(extra) < args.extra_words:
+        extra.add(''.join(rng.choice('甲乙丙丁戊己庚辛壬癸子丑寅卯辰巳午未申酉戌亥') for _ in range(rng.randint(2, 4))))
+    key_point_words += sorted(extra)
+
+    all_words = key_point_words + POSITIVE_WORDS + NEGATIVE_WORDS + TAG_WORDS
+    comments = make_corpus(args.comments, all_words, rng)
+    summaries = make_corpus(args.posts, all_words, rng, 20, 500)
+    titles = make_corpus(args.posts, all_words, rng, 5, 30)
+
+    start = time.perf_counter()
+    analyzer = TextAnalyzer(key_point_words=key_point_words)
+    build_time = time.perf_counter() - start
+
+    def run_legacy():
+        results = [(legacy_extract_key_points(text, key_point_words),
+                    legacy_analyze_sentiment(text, POSITIVE_WORDS, NEGATIVE_WORDS),
+                    legacy_extract_tags(title, text, TAG_WORDS))
+                   for title, text in zip(titles, summaries)]
+        results += [(legacy_extract_key_points(text, key_point_words),
+                     legacy_analyze_sentiment(text, POSITIVE_WORDS, NEGATIVE_WORDS))
+                    for text in comments]
+        return results
+
+    def run_current():
+        results = []
+        for title, text in zip(titles, summaries):
+            matches = analyzer.match(text)
+            results.append((analyzer.key_points(matches), analyzer.sentiment(matches),
+                            analyzer.tags(title, text, matches)))
+        for text in comments:
+            matches = analyzer.match(text)
+            results.append((analyzer.key_points(matches), analyzer.sentiment(matches)))
+        return results
+
+    legacy_time, legacy = best_of(run_legacy, args.repeat)
+    current_time, current = best_of(run_current, args.repeat)
+
+    mismatches = sum(1 for a, b in zip(legacy, current) if a != b)
+    print(f'posts={args.posts} comments={args.comments} dictionary_words={len(set(all_words))}')
+    print(f'build:   {build_time * 1000:8.2f} ms')
+    print(f'legacy:  {legacy_time * 1000:8.2f} ms')
+    print(f'matcher: {current_time * 1000:8.2f} ms  ({legacy_time / current_time:.2f}x)')
+    print(f'mismatches: {mismatches}')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""@用户名替换基准测试
+
+对比旧的逐用户名 str.replace 实现（每条评论遍历所有已出现的用户名，整楼为
+O(n²)）与 resolve_mentions 的单次遍历实现。合成楼层中的用户名互不为前缀，
+此时两者输出应完全一致。
+
+用法：python benchmarks/bench_mentions.py [--floors 1000] [--threads 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from v2ex_invest.core import resolve_mentions
+
+
+def legacy_resolve(comments):
+    username_to_floor = {}
+    contents = []
+    for i, comment in enumerate(comments, 1):
+        content = comment.get('content', '无内容')
+        username = comment.get('member', {}).get('username')
+        if username:
+            username_to_floor[username] = i
+        for name, floor in username_to_floor.items():
+            content = content.replace(f'@{name}', f'@#{floor}')
+        contents.append(content)
+    return contents
+
+
+def make_thread(floors, users, rng):
+    """生成一个楼层数为 floors 的帖子，约一半评论 @ 了前面的用户"""
+    comments = []
+    seen = []
+    for _ in range(floors):
+        username = rng.choice(users)
+        text = '我觉得这个观点有道理，继续观望' * rng.randint(1, 4)
+        if seen and rng.random() < 0.5:
+            text = f'@{rng.choice(seen)} ' + text
+        if seen and rng.random() < 0.1:
+            text += f' @{rng.choice(seen)} 同意'
+        comments.append({'content': text, 'member': {'username': username}})
+        seen.append(username)
+    return comments
+
+
+def main():
+    parser = argparse.ArgumentParser(description='@用户名替换基准测试')
+    parser.add_argument('--floors', type=int, default=1000, help='每个帖子的楼层数')
+    parser.add_argument('--threads', type=int, default=5, help='合成帖子数')
+    parser.add_argument('--users', type=int, default=400, help='参与讨论的用户数')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = [f'user{n:05d}' for n in range(args.users)]
+    threads = [make_thread(args.floors, users, rng) for _ in range(args.threads)]
+
+    start = time.perf_counter()
+    legacy = [legacy_resolve(comments) for comments in threads]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = [[content for content, _ in resolve_mentions(comments)] for comments in threads]
+    current_time = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, current) for x, y in zip(a, b) if x != y)
+    print(f'threads={args.threads} floors={args.floors} users={args.users}')
+    print(f'legacy:  {legacy_time * 1000:8.2f} ms')
+    print(f'resolve: {current_time * 1000:8.2f} ms  ({legacy_time / current_time:.1f}x)')
+    print(f'mismatches: {mismatches}')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
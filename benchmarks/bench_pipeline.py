@@ -0,0 +1,227 @@
+"""获取/导出流水线的端到端基准测试
+
+在本地回放服务（见 replay.py）上完整运行 FeedExporter，分别统计各阶段耗时、
+请求次数、峰值内存和导出文件大小。每个负载在独立的子进程中运行，峰值内存
+互不影响；网络请求不限速、不使用缓存和归档，只衡量流水线本身。
+
+阶段划分：
+    list      获取帖子列表（feed 请求和 feedparser 解析，或分页读取列表接口）
+    replies   等待评论请求的时间
+    html      拼装HTML片段
+    analysis  generate_ai_post 的文本分析
+    write     写出和提交导出文件
+
+结果与 benchmarks/baseline.json 对比，--save-baseline 用本次结果更新基线。
+
+用法：python benchmarks/bench_pipeline.py [--sizes 10 100 1000] [--max-replies 1000]
+"""
+import argparse
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import ReplayServer, load_fixtures, synthetic_workload
+from v2ex_invest import core
+from v2ex_invest.transport import HttpTransport
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STAGES = ['list', 'replies', 'html', 'analysis', 'write']
+
+
+class StageTimer:
+    """累计各阶段耗时，通过包装 FeedExporter 和导出文件类的方法计时"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, stage, elapsed):
+        self.totals[stage] = self.totals.get(stage, 0.0) + elapsed
+
+    def wrap(self, owner, name, stage):
+        func = getattr(owner, name)
+        timer = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.add(stage, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+
+    def wrap_generator(self, owner, name, stage):
+        """生成器按每次取值的等待时间计时"""
+        func = getattr(owner, name)
+        timer = self
+
+        def timed(*args, **kwargs):
+            results = func(*args, **kwargs)
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(results)
+                    except StopIteration:
+                        return
+                    finally:
+                        timer.add(stage, time.perf_counter() - start)
+                    yield item
+            finally:
+                results.close()
+
+        setattr(owner, name, timed)
+
+    def install(self):
+        self.wrap(core.FeedExporter, 'list_topics', 'list')
+        self.wrap_generator(core.FeedExporter, 'fetch_replies', 'replies')
+        self.wrap(core.FeedExporter, 'export_topic', 'export_topic')
+        self.wrap(core.FeedExporter, 'generate_ai_post', 'analysis')
+        for writer in (core.HtmlExportWriter, core.AiJsonWriter, core.AiJsonLinesWriter):
+            self.wrap(writer, 'write_post', 'write_post')
+        self.wrap(core.StreamingWriter, 'commit', 'commit')
+
+    def stages(self):
+        totals = self.totals
+        # export_topic 中除分析和写出以外的时间都用于拼装HTML
+        html = totals.get('export_topic', 0.0) - totals.get('analysis', 0.0) - totals.get('write_post', 0.0)
+        return {
+            "list": totals.get('list', 0.0),
+            "replies": totals.get('replies', 0.0),
+            "html": html,
+            "analysis": totals.get('analysis', 0.0),
+            "write": totals.get('write_post', 0.0) + totals.get('commit', 0.0),
+        }
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 会继承自父进程（fork 后 exec），优先读取本进程的 VmHWM
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为KB，macOS 上为字节
+    return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+
+
+def run_worker(base_url, start_date, end_date, source):
+    """在当前进程中运行一次导出，返回测量结果"""
+    timer = StageTimer()
+    timer.install()
+    # 关闭限速，测量流水线本身的开销
+    transport = HttpTransport(rate=1e9, burst=1e9)
+    with tempfile.TemporaryDirectory() as export_dir:
+        exporter = core.FeedExporter(start_date, end_date, export_dir,
+                                     export_html=True, export_ai_json=True, export_ai_jsonl=True,
+                                     nodes=core.DEFAULT_NODES if source == 'api' else None,
+                                     base_url=base_url, cache_path=None, archive_path=None,
+                                     transport=transport, log=lambda message, level=None: None)
+        start = time.perf_counter()
+        topics = exporter.run()
+        total = time.perf_counter() - start
+        output_bytes = sum(os.path.getsize(os.path.join(export_dir, name)) for name in os.listdir(export_dir))
+    transport.close()
+    if exporter.error is not None:
+        raise SystemExit(f'导出失败: {exporter.error}')
+
+    stats = transport.stats.summary()
+    return {
+        "topics": topics,
+        "total_s": round(total, 4),
+        "stages_s": {stage: round(elapsed, 4) for stage, elapsed in timer.stages().items()},
+        "requests": stats["requests"],
+        "download_bytes": stats["bytes"],
+        "output_bytes": output_bytes,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_workload(workload, source):
+    """在子进程中运行导出，返回测量结果"""
+    start_date, end_date = workload.date_range()
+    with ReplayServer(workload) as server:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', server.base_url,
+             start_date.isoformat(), end_date.isoformat(), '--source', source],
+            check=True, capture_output=True, text=True).stdout
+    result = json.loads(output)
+    result["replies"] = workload.reply_count
+    return result
+
+
+def format_change(current, baseline):
+    if not baseline:
+        return ''
+    return f' ({(current - baseline) / baseline * 100:+.0f}%)'
+
+
+def report(name, result, baseline):
+    baseline = baseline or {}
+    base_stages = baseline.get("stages_s", {})
+    print(f'{name}: {result["topics"]} 个帖子，{result["replies"]} 条评论')
+    print(f'  总耗时   {result["total_s"] * 1000:10.1f} ms{format_change(result["total_s"], baseline.get("total_s"))}')
+    for stage in STAGES:
+        elapsed = result["stages_s"][stage]
+        print(f'  {stage:<8} {elapsed * 1000:10.1f} ms{format_change(elapsed, base_stages.get(stage))}')
+    print(f'  请求数   {result["requests"]:10d}{format_change(result["requests"], baseline.get("requests"))}')
+    print(f'  峰值内存 {result["peak_rss_mb"]:10.1f} MB'
+          f'{format_change(result["peak_rss_mb"], baseline.get("peak_rss_mb"))}')
+    print(f'  导出大小 {result["output_bytes"] / 1024:10.1f} KB'
+          f'{format_change(result["output_bytes"], baseline.get("output_bytes"))}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='获取/导出流水线基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help='合成负载的帖子数')
+    parser.add_argument('--max-replies', type=int, default=1000, help='每个帖子的最多评论数')
+    parser.add_argument('--source', choices=['feed', 'api'], default='feed', help='帖子列表来源')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线结果文件')
+    parser.add_argument('--save-baseline', action='store_true', help='用本次结果更新基线')
+    parser.add_argument('--worker', nargs=3, metavar=('BASE_URL', 'START', 'END'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        base_url, start_date, end_date = args.worker
+        result = run_worker(base_url, date.fromisoformat(start_date), date.fromisoformat(end_date), args.source)
+        print(json.dumps(result))
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    fixtures = load_fixtures()
+    # 负载逐个生成，避免同时占用内存
+    workloads = itertools.chain([fixtures], (synthetic_workload(size, args.max_replies, args.seed, fixtures)
+                                             for size in args.sizes))
+    results = {}
+    for workload in workloads:
+        key = f'{workload.name}/{args.source}'
+        results[key] = run_workload(workload, args.source)
+        report(key, results[key], baseline.get(key))
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'基线已保存: {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""离线回放：用录制的或合成的数据模拟V2EX接口
+
+提供 invest.xml、/api/replies/show.json 和 /api/topics/show.json 三个接口，
+基准测试和调试时把 FeedExporter 的 base_url 指向本地服务即可，不访问外网。
+
+录制的样例数据放在 benchmarks/fixtures/ 下：invest.xml 为feed原文，
+topics.json 为节点帖子列表接口的条目，replies/<帖子ID>.json 为评论接口的原文。
+合成数据以这些样例为模板生成任意数量的帖子和评论。
+
+用法：
+    python benchmarks/replay.py serve [--topics 100] [--port 8765]
+    python benchmarks/replay.py record [--out benchmarks/fixtures] [--limit 20]
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import feedparser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from v2ex_invest.core import V2EX_BASE_URL, parse_replies, parse_topic_list, topic_id_from_link
+from v2ex_invest.transport import HttpTransport
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+TOPICS_PER_PAGE = 20         # 节点帖子列表接口每页的帖子数
+SYNTHETIC_USERS = 500        # 合成数据中的用户数
+
+
+class Workload:
+    """一组可回放的帖子：topics 为帖子列表接口格式的条目，replies 为帖子ID到评论列表的映射"""
+
+    def __init__(self, name, topics, replies, feed=None):
+        self.name = name
+        self.topics = sorted(topics, key=lambda item: item.get("last_touched", item["created"]), reverse=True)
+        self.replies = replies
+        # 录制的feed原样回放，合成数据根据帖子生成
+        self.feed = feed if feed is not None else build_feed(self.topics)
+
+    @property
+    def reply_count(self):
+        return sum(len(comments) for comments in self.replies.values())
+
+    def date_range(self):
+        dates = [datetime.fromtimestamp(item["created"], timezone.utc).date() for item in self.topics]
+        return min(dates), max(dates)
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def build_feed(topics):
+    """按V2EX的Atom格式生成feed"""
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<feed xmlns="http://www.w3.org/2005/Atom">',
+             '<title>V2EX - 投资</title>']
+    for item in topics:
+        author = item["member"]["username"]
+        lines.append(
+            f'<entry><title>{escape(item["title"])}</title>'
+            f'<link rel="alternate" type="text/html" href="{item["url"]}#reply{item["replies"]}" />'
+            f'<id>tag:www.v2ex.com,{format_time(item["created"])[:10]}:/t/{item["id"]}</id>'
+            f'<published>{format_time(item["created"])}</published>'
+            f'<updated>{format_time(item.get("last_touched", item["created"]))}</updated>'
+            f'<author><name>{author}</name><uri>https://www.v2ex.com/member/{author}</uri></author>'
+            f'<content type="html" xml:base="https://www.v2ex.com/" xml:lang="en">'
+            f'<![CDATA[{item["content_rendered"]}]]></content></entry>')
+    lines.append('</feed>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def load_fixtures(path=FIXTURES_DIR):
+    """读取录制的样例数据"""
+    with open(os.path.join(path, 'topics.json'), encoding='utf-8') as f:
+        topics = json.load(f)
+    with open(os.path.join(path, 'invest.xml'), 'rb') as f:
+        feed = f.read()
+    replies = {}
+    for filename in os.listdir(os.path.join(path, 'replies')):
+        with open(os.path.join(path, 'replies', filename), encoding='utf-8') as f:
+            replies[os.path.splitext(filename)[0]] = json.load(f)
+    return Workload('fixtures', topics, replies, feed)
+
+
+def synthetic_workload(topic_count, max_replies=1000, seed=1, fixtures=None):
+    """以样例数据为模板生成 topic_count 个帖子，每个帖子 0 到 max_replies 条评论
+
+    评论数按 max_replies * u^3 分布（u 为均匀分布），多数帖子评论不多，少数帖子
+    达到上千楼；约三分之一的评论会 @ 前面的用户或楼层。
+    """
+    fixtures = fixtures or load_fixtures()
+    rng = random.Random(seed)
+    titles = [item["title"] for item in fixtures.topics]
+    contents = [item["content_rendered"] for item in fixtures.topics]
+    texts = [comment["content"] for comments in fixtures.replies.values() for comment in comments]
+    users = [f'user{n:04d}' for n in range(SYNTHETIC_USERS)]
+    latest = max(item["created"] for item in fixtures.topics)
+
+    topics = []
+    replies = {}
+    for n in range(topic_count):
+        topic_id = 2000000 + n
+        created = latest - n * 1800
+        count = int(max_replies * rng.random() ** 3)
+        comments = []
+        for i in range(count):
+            text = rng.choice(texts)
+            if comments and rng.random() < 0.3:
+                if rng.random() < 0.8:
+                    text = f'@{rng.choice(comments)["member"]["username"]} {text}'
+                else:
+                    text = f'@#{rng.randint(1, len(comments))} {text}'
+            comments.append({"id": topic_id * 1000 + i, "content": text, "content_rendered": text,
+                             "created": created + 60 * (i + 1), "member": {"username": rng.choice(users)}})
+        replies[str(topic_id)] = comments
+        topics.append({
+            "id": topic_id,
+            "title": f'{rng.choice(titles)} #{n}',
+            "url": f'https://www.v2ex.com/t/{topic_id}',
+            "content": rng.choice(contents),
+            "content_rendered": rng.choice(contents),
+            "replies": count,
+            "member": {"username": rng.choice(users)},
+            "node": {"name": "invest", "title": "投资"},
+            "created": created,
+            "last_modified": created,
+            "last_touched": created + 60 * count,
+        })
+    return Workload(f'{topic_count}-topics', topics, replies)
+
+
+class ReplayServer:
+    """在本地端口回放 Workload 的HTTP服务，统计各接口的请求次数
+
+    failures 为 {接口路径: 次数}，对应接口的前几次请求返回 429（Retry-After: 0），
+    用于测试重试。响应带有按内容计算的 ETag，If-None-Match 一致时返回 304，
+    not_modified 统计各接口返回 304 的次数。
+    """
+
+    def __init__(self, workload, port=0, failures=None):
+        self.workload = workload
+        self.failures = dict(failures or {})
+        self.counts = {}
+        self.not_modified = {}
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.build_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def build_handler(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                with replay.lock:
+                    replay.counts[url.path] = replay.counts.get(url.path, 0) + 1
+                    failing = replay.failures.get(url.path, 0) > 0
+                    if failing:
+                        replay.failures[url.path] -= 1
+
+                if failing:
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                elif url.path == '/feed/invest.xml':
+                    self.reply(replay.workload.feed, 'application/atom+xml')
+                elif url.path == '/api/replies/show.json':
+                    comments = replay.workload.replies.get(query.get('topic_id', [''])[0], [])
+                    self.reply(json.dumps(comments, ensure_ascii=False).encode('utf-8'))
+                elif url.path == '/api/topics/show.json':
+                    page = int(query.get('p', ['1'])[0])
+                    items = replay.workload.topics[(page - 1) * TOPICS_PER_PAGE:page * TOPICS_PER_PAGE]
+                    self.reply(json.dumps(items, ensure_ascii=False).encode('utf-8'))
+                else:
+                    self.send_error(404)
+
+            def reply(self, body, content_type='application/json'):
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                if self.headers.get('If-None-Match') == etag:
+                    path = urlparse(self.path).path
+                    with replay.lock:
+                        replay.not_modified[path] = replay.not_modified.get(path, 0) + 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def record(out_dir=FIXTURES_DIR, base_url=V2EX_BASE_URL, node='invest', limit=20):
+    """从V2EX录制feed、帖子列表和评论，保存为回放用的样例数据"""
+    os.makedirs(os.path.join(out_dir, 'replies'), exist_ok=True)
+    with HttpTransport() as transport:
+        feed = transport.get(f'{base_url}/feed/{node}.xml').content
+        with open(os.path.join(out_dir, 'invest.xml'), 'wb') as f:
+            f.write(feed)
+
+        topics = transport.get(f'{base_url}/api/topics/show.json?node_name={node}&p=1', parse=parse_topic_list)
+        topics = topics[:limit]
+        with open(os.path.join(out_dir, 'topics.json'), 'w', encoding='utf-8') as f:
+            json.dump(topics, f, ensure_ascii=False, indent=2)
+
+        # feed中的帖子也要有评论数据，否则回放feed时评论接口会返回空列表
+        topic_ids = {str(item["id"]) for item in topics}
+        topic_ids.update(topic_id_from_link(entry.link) for entry in feedparser.parse(feed).entries)
+        for topic_id in sorted(topic_ids):
+            comments = transport.get(f'{base_url}/api/replies/show.json?topic_id={topic_id}', parse=parse_replies)
+            with open(os.path.join(out_dir, 'replies', f'{topic_id}.json'), 'w', encoding='utf-8') as f:
+                json.dump(comments, f, ensure_ascii=False, indent=2)
+            print(f'已录制帖子 {topic_id}: {len(comments)} 条评论')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='V2EX接口离线回放')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='启动回放服务')
+    serve_parser.add_argument('--topics', type=int, help='合成帖子数，不指定时回放录制的样例数据')
+    serve_parser.add_argument('--max-replies', type=int, default=1000, help='合成数据每个帖子的最多评论数')
+    serve_parser.add_argument('--seed', type=int, default=1)
+    serve_parser.add_argument('--port', type=int, default=8765)
+
+    record_parser = subparsers.add_parser('record', help='从V2EX录制样例数据')
+    record_parser.add_argument('--out', default=FIXTURES_DIR, help='样例数据目录')
+    record_parser.add_argument('--node', default='invest')
+    record_parser.add_argument('--limit', type=int, default=20, help='录制的帖子数')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.out, node=args.node, limit=args.limit)
+        return 0
+
+    if args.topics:
+        workload = synthetic_workload(args.topics, args.max_replies, args.seed)
+    else:
+        workload = load_fixtures()
+    with ReplayServer(workload, args.port) as server:
+        start_date, end_date = workload.date_range()
+        print(f'回放 {workload.name}: {len(workload.topics)} 个帖子，{workload.reply_count} 条评论，'
+              f'日期 {start_date} ~ {end_date}')
+        print(f'base_url: {server.base_url}', flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# 测试使用 benchmarks/replay.py 中的本地回放服务
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
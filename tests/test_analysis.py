@@ -0,0 +1,32 @@
+"""帖子模型和语料关键词"""
+from v2ex_invest.core import TextAnalyzer, comments_from_replies
+from v2ex_invest.keywords import CorpusKeywordExtractor
+from v2ex_invest.models import Post
+
+
+def test_author_comments_are_marked_without_rendering():
+    comments = comments_from_replies([{"content": "楼主补充", "member": {"username": "op"}},
+                                      {"content": "路过", "member": {"username": "other"}},
+                                      {"content": "匿名回复"}])
+    post = Post(id='1', title='标题', author='op', published='2024-07-01T00:00:00Z', link='https://example.com/t/1',
+                summary='正文', analyzer=TextAnalyzer(), comments=comments)
+    assert [comment["is_author_comment"] for comment in post.to_ai_dict()["comments"]] == [True, False, False]
+
+
+def test_extra_key_points_are_whole_terms():
+    analyzer = TextAnalyzer()
+    comments = ['@lisi-dev 谢谢，打算先卖出三分之一', '@lisi-dev 主要是担心以后急用钱',
+                '看流动性需求，留够应急资金再说', '@#2 同意，应急资金优先', '@coolbear 先卖出一部分，留够应急资金']
+    posts = [{"id": '1', "title": '现在还能上车吗', "summary": '<p>@<a href="/member/coolbear">coolbear</a> 怎么看</p>',
+              "tags": [], "key_points": [],
+              "comments": [{"floor": floor, "content": content, "key_points": analyzer.key_points(analyzer.match(content))}
+                           for floor, content in enumerate(comments, 1)]}]
+    terms = {}
+    CorpusKeywordExtractor(path=None).enrich_posts(posts, analyzer, terms)
+
+    # 用户名不参与分词；“应急资”“急资金”等碎片被完整的“应急资金”取代
+    assert not any(name in word for words in terms.values() for word in words for name in ('lisi', 'dev', 'coolbear'))
+    assert terms['1#1'] == ['先卖出']
+    # “先卖出”包含已命中的词典词“卖出”，不再补充
+    assert [comment["key_points"] for comment in posts[0]["comments"]] == [
+        ['卖出'], [], ['应急资金'], ['应急资金'], ['卖出', '应急资金']]
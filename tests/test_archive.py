@@ -0,0 +1,70 @@
+"""本地归档的写入、替换和查询"""
+import pytest
+
+from v2ex_invest.archive import Archive, build_match_query, segment_text
+
+
+def comment(floor, content, sentiment='neutral', key_points=()):
+    return {"floor": floor, "author": f'user{floor}', "content": content, "is_author_comment": False,
+            "sentiment": sentiment, "key_points": list(key_points), "mentioned_floors": []}
+
+
+def ai_post(post_id, title, summary, comments, tags=(), sentiment='neutral', published='2024-07-01T08:00:00Z'):
+    return {"id": post_id, "title": title, "author": 'op', "published": published,
+            "link": f'https://www.v2ex.com/t/{post_id}', "summary": summary, "tags": list(tags),
+            "sentiment": sentiment, "key_points": [], "comments": comments}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = Archive(str(tmp_path / 'archive.sqlite3'))
+    archive.upsert_post(ai_post('1', '黄金ETF还能上车吗', '<p>最近黄金涨得猛</p>', [
+        comment(1, '我一直定投沪深300ETF', 'positive', ['定投']),
+        comment(2, '金价太高，先观望', 'negative'),
+    ], tags=['黄金'], sentiment='positive', published='2024-07-02T08:00:00Z'))
+    archive.upsert_post(ai_post('2', '分享指数基金定投策略', '标普500 + 纳指', [
+        comment(1, '定投要坚持', 'positive', ['定投']),
+    ], tags=['基金']))
+    yield archive
+    archive.close()
+
+
+def locations(results):
+    return [(item["post_id"], item["floor"]) for item in results]
+
+
+def test_segment_text_splits_cjk_into_bigrams_and_keeps_ascii_words():
+    assert segment_text('<b>黄金ETF</b>涨了 A股') == ('黄金 etf 涨了 a', '黄 金 涨 了 股')
+    assert build_match_query('定投策略 ETF 金') == 'terms : "定投 投策 策略" AND terms : "etf" AND chars : "金"'
+
+
+def test_mixed_cjk_and_ascii_query(archive):
+    # 标题和正文一起检索；英文不区分大小写
+    assert locations(archive.search('黄金 etf')) == [('1', 0)]
+    assert locations(archive.search('沪深 300ETF')) == [('1', 1)]
+    assert locations(archive.search('定投策略')) == [('2', 0)]
+    # 二元组按短语匹配，顺序不同不会命中
+    assert archive.search('投定') == []
+    assert locations(archive.search('金', scope='comments')) == [('1', 2)]
+
+
+def test_tag_and_sentiment_filters(archive):
+    # 标签对帖子下的评论同样生效
+    assert locations(archive.search(tag='黄金')) == [('1', 0), ('1', 1), ('1', 2)]
+    assert locations(archive.search(sentiment='positive')) == [('1', 0), ('1', 1), ('2', 1)]
+    assert locations(archive.search('定投', tag='基金', sentiment='positive')) == [('2', 1)]
+    assert locations(archive.search(key_point='定投', scope='comments')) == [('1', 1), ('2', 1)]
+
+
+def test_upsert_replaces_post_and_comments(archive):
+    archive.upsert_post(ai_post('1', '黄金还能上车吗', '已经卖出', [comment(1, '恭喜落袋', 'positive')],
+                                tags=['卖出'], published='2024-07-02T08:00:00Z'))
+
+    assert archive.search('etf') == []
+    assert archive.search('观望') == []
+    assert archive.search(tag='黄金') == []
+    assert locations(archive.search(tag='卖出')) == [('1', 0), ('1', 1)]
+    assert locations(archive.search('落袋')) == [('1', 1)]
+    assert archive.get_comments('1') == [{"member": {"username": 'user1'}, "content": '恭喜落袋'}]
+    assert [topic["title"] for topic in archive.list_topics('2024-07-01', '2024-07-02')] == \
+        ['黄金还能上车吗', '分享指数基金定投策略']
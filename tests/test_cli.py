@@ -0,0 +1,60 @@
+"""命令行导出，使用本地回放服务"""
+import json
+import os
+
+from replay import ReplayServer, load_fixtures
+from v2ex_invest.cli import main
+
+
+def export_args(server, workload, output_dir, *extra):
+    start_date, end_date = workload.date_range()
+    return ['export', '--start', str(start_date), '--end', str(end_date), '-o', str(output_dir),
+            '--base-url', server.base_url, '--no-cache', '--no-archive', '--requests-per-hour', '0', *extra]
+
+
+def test_export_writes_every_requested_format(tmp_path):
+    workload = load_fixtures()
+    with ReplayServer(workload) as server:
+        assert main(export_args(server, workload, tmp_path, '-f', 'html', 'site', 'ai-json')) == 0
+
+    names = os.listdir(tmp_path)
+    assert any(name.endswith('.html') for name in names)
+    assert any(name.endswith('_ai.json') for name in names)
+    site_dirs = [name for name in names if name.endswith('_site')]
+    assert len(site_dirs) == 1
+    assert os.path.exists(tmp_path / site_dirs[0] / 'index.html')
+    assert os.listdir(tmp_path / site_dirs[0] / 'shards')
+
+
+def test_incremental_site_only_is_rejected(tmp_path, capsys):
+    workload = load_fixtures()
+    with ReplayServer(workload) as server:
+        assert main(export_args(server, workload, tmp_path, '-f', 'site', '--incremental')) == 2
+        assert server.counts == {}
+    assert '增量导出不支持分片网页格式' in capsys.readouterr().err
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_uses_dictionary_file(tmp_path):
+    workload = load_fixtures()
+    dictionary = tmp_path / 'words.json'
+    dictionary.write_text(json.dumps({"key_point_words": ['黄金', '定投']}, ensure_ascii=False), encoding='utf-8')
+    output_dir = tmp_path / 'out'
+    output_dir.mkdir()
+    with ReplayServer(workload) as server:
+        assert main(export_args(server, workload, output_dir, '-f', 'ai-json', '--dictionary', str(dictionary))) == 0
+
+    name = next(name for name in os.listdir(output_dir) if name.endswith('_ai.json'))
+    with open(output_dir / name, encoding='utf-8') as f:
+        posts = json.load(f)["posts"]
+    key_points = {word for post in posts for item in [post, *post["comments"]] for word in item["key_points"]}
+    # 默认词典中的“卖出”“应急资金”等不再出现
+    assert key_points == {'黄金', '定投'}
+
+
+def test_missing_dictionary_is_rejected(tmp_path, capsys):
+    workload = load_fixtures()
+    with ReplayServer(workload) as server:
+        assert main(export_args(server, workload, tmp_path, '--dictionary', str(tmp_path / 'missing.json'))) == 2
+        assert server.counts == {}
+    assert '读取词典失败' in capsys.readouterr().err
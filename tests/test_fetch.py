@@ -0,0 +1,257 @@
+"""评论并发获取、重试和完整导出，使用本地回放服务，不访问外网"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from replay import ReplayServer, load_fixtures, synthetic_workload
+from v2ex_invest.core import FeedExporter, ReplyFetcher, TopicCache, TopicLister
+from v2ex_invest.transport import HttpTransport, RequestCancelled
+
+REPLIES_PATH = '/api/replies/show.json'
+FEED_PATH = '/feed/invest.xml'
+
+
+def quiet(message, level=logging.INFO):
+    pass
+
+
+def collect(messages):
+    """日志回调，只保存消息文本"""
+    return lambda message, level=logging.INFO: messages.append(message)
+
+
+@pytest.fixture(scope='module')
+def workload():
+    return synthetic_workload(30, max_replies=60, seed=3, fixtures=load_fixtures())
+
+
+def test_replies_come_back_in_topic_order(workload):
+    topic_ids = [str(item["id"]) for item in workload.topics]
+    with ReplayServer(workload) as server, HttpTransport(rate=None) as transport:
+        fetcher = ReplyFetcher(transport, base_url=server.base_url, max_workers=8)
+        results = list(fetcher.fetch_all(topic_ids))
+
+    assert [result["topic_id"] for result in results] == topic_ids
+    for result in results:
+        replies = workload.replies[result["topic_id"]]
+        assert result["error"] is None
+        assert [comment.floor for comment in result["comments"]] == list(range(1, len(replies) + 1))
+        assert [comment.content for comment in result["comments"]] == [reply["content"] for reply in replies]
+    assert server.counts[REPLIES_PATH] == len(topic_ids)
+
+
+def test_429_then_success_is_retried(workload):
+    topic_id = str(workload.topics[0]["id"])
+    with ReplayServer(workload, failures={REPLIES_PATH: 1}) as server, HttpTransport(rate=None) as transport:
+        result = ReplyFetcher(transport, base_url=server.base_url).fetch_one(topic_id)
+
+    assert result["error"] is None
+    assert len(result["comments"]) == len(workload.replies[topic_id])
+    assert server.counts[REPLIES_PATH] == 2
+    stats = transport.stats.summary()
+    assert (stats["requests"], stats["retries"], stats["failures"]) == (2, 1, 0)
+    assert any('429' in message and level == logging.WARNING for message, level in result["messages"])
+
+
+def test_retries_are_bounded(workload):
+    topic_id = str(workload.topics[0]["id"])
+    with ReplayServer(workload, failures={REPLIES_PATH: 10}) as server, \
+            HttpTransport(rate=None, max_retries=2) as transport:
+        result = ReplyFetcher(transport, base_url=server.base_url).fetch_one(topic_id)
+
+    assert result["comments"] is None
+    assert '429' in result["error"]
+    assert server.counts[REPLIES_PATH] == 2
+
+
+def test_cancel_wakes_requests_waiting_for_tokens(workload):
+    topic_id = str(workload.topics[0]["id"])
+    # 每小时只有一个令牌，第二个请求要等约一小时
+    with ReplayServer(workload) as server, HttpTransport(rate=1 / 3600, burst=1) as transport:
+        fetcher = ReplyFetcher(transport, base_url=server.base_url)
+        assert fetcher.fetch_one(topic_id)["error"] is None
+        threading.Timer(0.2, transport.cancel).start()
+        start = time.monotonic()
+        with pytest.raises(RequestCancelled):
+            transport.get(f'{server.base_url}/api/replies/show.json?topic_id={topic_id}')
+        assert time.monotonic() - start < 5
+    assert server.counts[REPLIES_PATH] == 1
+
+
+def test_export_against_replay_server(tmp_path):
+    workload = load_fixtures()
+    start_date, end_date = workload.date_range()
+    with ReplayServer(workload) as server:
+        exporter = FeedExporter(start_date, end_date, str(tmp_path), nodes=['invest'], base_url=server.base_url,
+                                cache_path=None, archive_path=None, requests_per_hour=0, log=quiet)
+        processed = exporter.run()
+
+    assert exporter.error is None
+    assert processed == len(workload.topics)
+    with open(tmp_path / f'{exporter.base_filename()}_ai.json', encoding='utf-8') as f:
+        posts = json.load(f)["posts"]
+    assert [post["published"] for post in posts] == sorted((post["published"] for post in posts), reverse=True)
+    for post in posts:
+        replies = workload.replies[post["id"]]
+        assert [comment["content"] for comment in post["comments"]] == [reply["content"] for reply in replies]
+    assert os.path.exists(tmp_path / f'{exporter.base_filename()}.html')
+
+
+def test_connection_pool_grows_with_workers(tmp_path):
+    workload = load_fixtures()
+    start_date, end_date = workload.date_range()
+    with ReplayServer(workload) as server:
+        exporter = FeedExporter(start_date, end_date, str(tmp_path), nodes=['invest'], base_url=server.base_url,
+                                cache_path=None, archive_path=None, requests_per_hour=0, workers=16,
+                                log=quiet)
+        exporter.run()
+    assert exporter.error is None
+    assert exporter.transport.pool_size == 16
+
+
+def load_posts(exporter):
+    with open(os.path.join(exporter.export_dir, f'{exporter.base_filename()}_ai.json'), encoding='utf-8') as f:
+        return {post["id"]: post for post in json.load(f)["posts"]}
+
+
+def test_unchanged_feed_and_replies_come_from_cache(tmp_path):
+    workload = load_fixtures()
+    start_date, end_date = workload.date_range()
+    cache_path = str(tmp_path / 'cache.sqlite3')
+    messages = []
+    with ReplayServer(workload) as server:
+        for _ in range(2):
+            exporter = FeedExporter(start_date, end_date, str(tmp_path), base_url=server.base_url,
+                                    cache_path=cache_path, archive_path=None, requests_per_hour=0,
+                                    log=collect(messages))
+            exporter.run()
+            assert exporter.error is None
+
+    # 第二次的feed请求带 If-None-Match 并得到 304，评论全部来自缓存
+    assert server.counts[FEED_PATH] == 2
+    assert server.not_modified[FEED_PATH] == 1
+    assert server.counts[REPLIES_PATH] == len(load_posts(exporter))
+    assert 'feed 未更新，使用本地缓存' in messages
+    posts = load_posts(exporter)
+    for topic_id, post in posts.items():
+        assert [comment["content"] for comment in post["comments"]] == \
+            [reply["content"] for reply in workload.replies[topic_id]]
+
+
+def test_only_topics_with_new_version_are_refetched(tmp_path):
+    workload = synthetic_workload(5, max_replies=20, seed=4, fixtures=load_fixtures())
+    start_date, end_date = workload.date_range()
+    cache_path = str(tmp_path / 'cache.sqlite3')
+    with ReplayServer(workload) as server:
+        def export():
+            exporter = FeedExporter(start_date, end_date, str(tmp_path), nodes=['invest'],
+                                    base_url=server.base_url, cache_path=cache_path, archive_path=None,
+                                    requests_per_hour=0, log=quiet)
+            exporter.run()
+            assert exporter.error is None
+            return exporter
+
+        export()
+        assert server.counts[REPLIES_PATH] == 5
+
+        topic = workload.topics[2]
+        replies = workload.replies[str(topic["id"])]
+        replies.append({"id": 1, "content": '新回复', "content_rendered": '新回复',
+                        "created": topic["last_touched"] + 60, "member": {"username": 'newcomer'}})
+        topic["replies"] += 1
+        topic["last_touched"] += 60
+        exporter = export()
+
+    assert server.counts[REPLIES_PATH] == 6
+    comments = load_posts(exporter)[str(topic["id"])]["comments"]
+    assert comments[-1]["content"] == '新回复'
+    assert len(comments) == len(replies)
+
+
+def test_cache_evicts_expired_and_least_recently_used(tmp_path):
+    cache = TopicCache(str(tmp_path / 'cache.sqlite3'), ttl_days=1, max_topics=2)
+    try:
+        for topic_id in ['1', '2', '3', '4']:
+            cache.put_replies(topic_id, 'v1', [{"floor": 1}])
+        now = time.time()
+        with cache.conn:
+            cache.conn.execute('UPDATE replies SET accessed_at = ? WHERE topic_id = ?', (now - 2 * 86400, '1'))
+            for offset, topic_id in enumerate(['2', '3', '4']):
+                cache.conn.execute('UPDATE replies SET accessed_at = ? WHERE topic_id = ?',
+                                   (now - 3600 + offset, topic_id))
+        # 读取会刷新访问时间，'2' 因此比 '3' 更晚被访问
+        assert cache.get_replies('2', 'v1') == [{"floor": 1}]
+        assert cache.get_replies('2', 'v2') is None
+
+        assert cache.evict() == 2
+        assert cache.get_replies('1', 'v1') is None
+        assert cache.get_replies('3', 'v1') is None
+        assert cache.get_replies('2', 'v1') is not None
+        assert cache.get_replies('4', 'v1') is not None
+    finally:
+        cache.close()
+
+
+class FakeTopicTransport:
+    """按页码返回帖子列表并记录请求的页码；ignore_page 时每页都返回第一页"""
+
+    def __init__(self, items, per_page=2, ignore_page=False):
+        self.items = items
+        self.per_page = per_page
+        self.ignore_page = ignore_page
+        self.pages = []
+
+    def get(self, url, parse=None, log=None):
+        page = int(url.rsplit('p=', 1)[1])
+        self.pages.append(page)
+        if self.ignore_page:
+            page = 1
+        return self.items[(page - 1) * self.per_page:page * self.per_page]
+
+
+def topic_items(count, created):
+    return [{"id": 100 + n, "title": f't{n}', "created": created - n * 3600, "last_touched": created - n * 3600}
+            for n in range(count)]
+
+
+def test_topic_lister_reads_only_needed_pages():
+    created = datetime(2024, 7, 10, 12, tzinfo=timezone.utc).timestamp()
+    transport = FakeTopicTransport(topic_items(3, created), per_page=20)
+    topics = TopicLister(transport, nodes=['invest']).list_topics(date(2024, 7, 1), date(2024, 7, 10))
+    assert len(topics) == 3
+    # 第一页不满时第二页为空，之后不再请求
+    assert sorted(transport.pages) == [1, 2]
+
+
+def test_topic_lister_stops_when_pages_repeat():
+    created = datetime(2024, 7, 10, 12, tzinfo=timezone.utc).timestamp()
+    transport = FakeTopicTransport(topic_items(2, created), ignore_page=True)
+    messages = []
+    topics = TopicLister(transport, nodes=['invest']).list_topics(date(2024, 7, 1), date(2024, 7, 10),
+                                                                  log=collect(messages))
+    assert [topic["id"] for topic in topics] == ['100', '101']
+    assert sorted(transport.pages) == [1, 2]
+    assert any('停止回溯' in message for message in messages)
+
+
+def test_export_continues_when_archive_cannot_be_opened(tmp_path):
+    workload = load_fixtures()
+    start_date, end_date = workload.date_range()
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    messages = []
+    with ReplayServer(workload) as server:
+        exporter = FeedExporter(start_date, end_date, str(tmp_path), nodes=['invest'], base_url=server.base_url,
+                                cache_path=None, archive_path=str(blocker / 'archive.sqlite3'),
+                                requests_per_hour=0, log=collect(messages))
+        processed = exporter.run()
+
+    assert exporter.error is None
+    assert processed == len(workload.topics)
+    assert any(message.startswith('打开本地归档失败') for message in messages)
+    assert os.path.exists(tmp_path / f'{exporter.base_filename()}_ai.json')
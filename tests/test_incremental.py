@@ -0,0 +1,133 @@
+"""增量导出：增量日志合并、端到端回放和滚动日期范围"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from replay import ReplayServer, Workload, load_fixtures, synthetic_workload
+from v2ex_invest.core import FeedExporter
+from v2ex_invest.incremental import DELTA_SUFFIX, IncrementalExporter, merge_record
+
+REPLIES_PATH = '/api/replies/show.json'
+
+
+def quiet(message, level=logging.INFO):
+    pass
+
+
+def post(topic_id, floors):
+    return {"id": topic_id, "comments": [{"floor": floor} for floor in floors]}
+
+
+def test_merge_record_dedupes_by_floor():
+    posts = {}
+    merge_record(posts, {"op": "post", "post": post('1', [1, 2])})
+    merge_record(posts, {"op": "comments", "topic_id": '1', "comments": post('1', [2, 3])["comments"]})
+    # 中断后重放的同一条记录不会产生重复楼层
+    merge_record(posts, {"op": "comments", "topic_id": '1', "comments": post('1', [2, 3])["comments"]})
+    merge_record(posts, {"op": "post", "post": post('1', [1, 2, 3, 4])})
+    assert [comment["floor"] for comment in posts['1']["comments"]] == [1, 2, 3, 4]
+
+
+def test_merge_record_ignores_comments_for_unknown_topic():
+    posts = {'1': post('1', [])}
+    merge_record(posts, {"op": "comments", "topic_id": '2', "comments": [{"floor": 1}]})
+    merge_record(posts, {"op": "comments", "topic_id": 1, "comments": [{"floor": 1}]})
+    assert list(posts) == ['1']
+    assert [comment["floor"] for comment in posts['1']["comments"]] == [1]
+
+
+def export(exporter_class, server, export_dir, start_date, end_date, **options):
+    exporter = exporter_class(start_date, end_date, str(export_dir), nodes=['invest'], base_url=server.base_url,
+                              cache_path=None, archive_path=None, requests_per_hour=0, log=quiet, **options)
+    exporter.run()
+    assert exporter.error is None
+    return exporter
+
+
+def load_posts(exporter):
+    with open(os.path.join(exporter.export_dir, f'{exporter.base_filename()}_ai.json'), encoding='utf-8') as f:
+        return json.load(f)["posts"]
+
+
+def add_reply(workload, topic, content):
+    replies = workload.replies.setdefault(str(topic["id"]), [])
+    created = topic["last_touched"] + 60
+    replies.append({"id": topic["id"] * 1000 + len(replies), "content": content, "content_rendered": content,
+                    "created": created, "member": {"username": 'newcomer'}})
+    topic["replies"] = len(replies)
+    topic["last_touched"] = created
+
+
+def test_incremental_export_matches_full_export(tmp_path):
+    workload = synthetic_workload(8, max_replies=30, seed=5, fixtures=load_fixtures())
+    start_date, end_date = workload.date_range()
+    incremental_dir = tmp_path / 'incremental'
+    full_dir = tmp_path / 'full'
+    incremental_dir.mkdir()
+    full_dir.mkdir()
+
+    with ReplayServer(workload) as server:
+        exporter = export(IncrementalExporter, server, incremental_dir, start_date, end_date, compact_every=100)
+        assert server.counts[REPLIES_PATH] == 8
+        delta_path = os.path.join(incremental_dir, exporter.base_filename() + DELTA_SUFFIX)
+        # 第一次运行没有快照，直接合并
+        assert not os.path.exists(delta_path)
+
+        # 一个帖子有新回复，另有一个新帖子
+        changed = workload.topics[3]
+        floors = len(workload.replies[str(changed["id"])])
+        add_reply(workload, changed, '新的一楼')
+        created = workload.topics[0]["created"] + 600
+        new_topic = dict(workload.topics[0], id=3000000, title='新帖子', replies=0, created=created,
+                         last_modified=created, last_touched=created, url='https://www.v2ex.com/t/3000000')
+        workload.replies['3000000'] = []
+        add_reply(workload, new_topic, '沙发')
+        workload.topics.insert(0, new_topic)
+
+        export(IncrementalExporter, server, incremental_dir, start_date, end_date, compact_every=100)
+        # 版本标记没变的帖子不请求评论
+        assert server.counts[REPLIES_PATH] == 10
+        with open(delta_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert [record["op"] for record in records] == ['post', 'comments']
+        assert records[0]["post"]["id"] == '3000000'
+        assert records[1]["topic_id"] == str(changed["id"])
+        assert [comment["floor"] for comment in records[1]["comments"]] == [floors + 1]
+
+        exporter = export(IncrementalExporter, server, incremental_dir, start_date, end_date, force_compact=True)
+        assert server.counts[REPLIES_PATH] == 10
+        assert not os.path.exists(delta_path)
+        full = export(FeedExporter, server, full_dir, start_date, end_date)
+
+    assert load_posts(exporter) == load_posts(full)
+    assert len(load_posts(exporter)) == 9
+
+
+def test_rolling_window_reuses_files_and_drops_old_topics(tmp_path):
+    fixtures = load_fixtures()
+    base = synthetic_workload(4, max_replies=5, seed=6, fixtures=fixtures)
+    # 四个帖子分别在连续四天发布
+    latest = datetime(2024, 7, 4, 12, tzinfo=timezone.utc).timestamp()
+    for n, topic in enumerate(base.topics):
+        topic["created"] = topic["last_modified"] = latest - n * 86400
+        topic["last_touched"] = topic["created"] + 60 * topic["replies"]
+    workload = Workload('rolling', base.topics, base.replies)
+    day = datetime(2024, 7, 4).date()
+
+    with ReplayServer(workload) as server:
+        first = export(IncrementalExporter, server, tmp_path, day - timedelta(days=3), day - timedelta(days=1),
+                       window_days=3)
+        second = export(IncrementalExporter, server, tmp_path, day - timedelta(days=2), day, window_days=3)
+
+    assert first.base_filename() == second.base_filename() == 'v2ex_invest_invest_last3d'
+    assert sorted(os.listdir(tmp_path)) == ['v2ex_invest_invest_last3d.html', 'v2ex_invest_invest_last3d_ai.json',
+                                            'v2ex_invest_invest_last3d_state.sqlite3']
+    posts = load_posts(second)
+    assert [post["published"][:10] for post in posts] == ['2024-07-04', '2024-07-03', '2024-07-02']
+    with open(tmp_path / 'v2ex_invest_invest_last3d.html', encoding='utf-8') as f:
+        html = f.read()
+    assert base.topics[3]["title"] not in html
+    assert base.topics[0]["title"] in html
+    # 仍在范围内的帖子没有变化，不重新请求评论
+    assert server.counts[REPLIES_PATH] == 4
@@ -0,0 +1,31 @@
+"""词典关键词匹配和自定义词典"""
+import json
+
+from v2ex_invest.core import KeywordMatcher, TextAnalyzer
+
+
+def naive_match(words, text):
+    return {word for word in words if word in text}
+
+
+def test_matcher_finds_overlapping_and_contained_words():
+    words = ['亏', '亏损', '损失', '黄金', '黄金ETF', 'A股', '股票']
+    matcher = KeywordMatcher(words)
+    for text in ['黄金ETF亏损失败', 'A股票', '亏亏亏', '', '没有命中', '黄金黄金ETF']:
+        assert matcher.match(text) == naive_match(words, text)
+
+
+def test_analyzer_key_points_follow_dictionary_order():
+    analyzer = TextAnalyzer()
+    matches = analyzer.match('卖出股票后买入基金，风险不大')
+    assert analyzer.key_points(matches) == [word for word in analyzer.key_point_words if word in matches][:5]
+
+
+def test_dictionary_file_overrides_only_given_words(tmp_path):
+    path = tmp_path / 'words.json'
+    path.write_text(json.dumps({"key_point_words": ['黄金', '定投']}, ensure_ascii=False), encoding='utf-8')
+    analyzer = TextAnalyzer.from_file(str(path))
+    matches = analyzer.match('定投黄金，卖出股票')
+    assert analyzer.key_points(matches) == ['黄金', '定投']
+    assert analyzer.positive_words == TextAnalyzer().positive_words
+    assert analyzer.version != TextAnalyzer().version
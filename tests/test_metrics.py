@@ -0,0 +1,41 @@
+"""运行指标的Prometheus文本格式"""
+import re
+
+from v2ex_invest.metrics import Metrics
+
+SAMPLE_PATTERN = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="(\\.|[^"\\])*",?)*\})? \S+$')
+
+
+def test_render_counters_histograms_and_escaped_labels():
+    metrics = Metrics(buckets=(0.1, 1))
+    metrics.inc('http_requests_total', path='/api/replies/show.json', status=200)
+    metrics.inc('http_requests_total', 2, path='/api/replies/show.json', status=200)
+    metrics.inc('runs_total', result='error "timeout"\nat C:\\tmp')
+    metrics.set('last_run_topics', 4)
+    for value in (0.05, 0.5, 3):
+        metrics.observe('stage_seconds', value, stage='render')
+
+    text = metrics.render()
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    for line in lines:
+        assert line.startswith('# HELP ') or line.startswith('# TYPE ') or SAMPLE_PATTERN.match(line), line
+
+    assert '# TYPE v2ex_invest_http_requests_total counter' in lines
+    assert 'v2ex_invest_http_requests_total{path="/api/replies/show.json",status="200"} 3' in lines
+    assert 'v2ex_invest_runs_total{result="error \\"timeout\\"\\nat C:\\\\tmp"} 1' in lines
+    assert '# TYPE v2ex_invest_last_run_topics gauge' in lines
+    assert 'v2ex_invest_last_run_topics 4' in lines
+
+    # 桶计数是累积的，+Inf 桶等于总次数
+    assert '# TYPE v2ex_invest_stage_seconds histogram' in lines
+    assert [line for line in lines if line.startswith('v2ex_invest_stage_seconds')] == [
+        'v2ex_invest_stage_seconds_bucket{stage="render",le="0.1"} 1',
+        'v2ex_invest_stage_seconds_bucket{stage="render",le="1"} 2',
+        'v2ex_invest_stage_seconds_bucket{stage="render",le="+Inf"} 3',
+        'v2ex_invest_stage_seconds_sum{stage="render"} 3.55',
+        'v2ex_invest_stage_seconds_count{stage="render"} 3',
+    ]
+    # 每个指标只有一组 HELP/TYPE
+    type_lines = [line for line in lines if line.startswith('# TYPE ')]
+    assert len(type_lines) == len(set(type_lines)) == 4
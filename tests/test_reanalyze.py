@@ -0,0 +1,94 @@
+"""重新分析已导出的AI JSON文件"""
+import json
+import os
+
+import pytest
+
+from v2ex_invest.core import TextAnalyzer, analyze_post
+from v2ex_invest.reanalyze import load_export, reanalyze, save_export
+
+
+def raw_post(post_id, summary, comments):
+    return {"id": post_id, "title": f'帖子{post_id}', "author": 'op', "published": f'2024-07-0{post_id}T08:00:00Z',
+            "link": f'https://www.v2ex.com/t/{post_id}', "summary": summary,
+            "comments": [{"floor": floor, "author": 'user', "content": content}
+                         for floor, content in enumerate(comments, 1)]}
+
+
+@pytest.fixture
+def export_path(tmp_path):
+    posts = [analyze_post(raw_post('1', '黄金涨了，卖出一部分', ['继续定投']), TextAnalyzer()),
+             analyze_post(raw_post('2', '基金亏损，风险太大', ['割肉离场']), TextAnalyzer())]
+    path = str(tmp_path / 'v2ex_invest_20240701_20240702_ai.json')
+    save_export(path, {"source": "V2EX投资板块", "total_posts": len(posts)}, posts)
+    return path
+
+
+def write_dictionary(tmp_path, words):
+    path = tmp_path / 'words.json'
+    path.write_text(json.dumps({"key_point_words": words}, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_save_export_matches_json_dump_and_replaces_atomically(export_path):
+    metadata, posts = load_export(export_path)
+    with open(export_path, encoding='utf-8') as f:
+        assert f.read() == json.dumps({"metadata": metadata, "posts": posts}, ensure_ascii=False, indent=2)
+
+    # 写入中途失败时原文件不变，也不留下临时文件
+    with open(export_path, 'rb') as f:
+        original = f.read()
+    with pytest.raises(TypeError):
+        save_export(export_path, metadata, posts + [{"id": object()}])
+    with open(export_path, 'rb') as f:
+        assert f.read() == original
+    assert not os.path.exists(export_path + '.part')
+
+    jsonl_path = export_path[:-len('.json')] + '.jsonl'
+    save_export(jsonl_path, metadata, posts)
+    assert load_export(jsonl_path) == (metadata, posts)
+
+
+def test_unchanged_posts_are_skipped_by_hash_and_analyzer_version(tmp_path, export_path):
+    messages = []
+    assert reanalyze([export_path], workers=1, log=messages.append)[export_path] == (2, 0)
+    stat = os.stat(export_path)
+
+    # 内容和词典都没变：不再分析，也不重写文件
+    assert reanalyze([str(tmp_path)], workers=1, log=messages.append)[export_path] == (0, 0)
+    assert os.stat(export_path).st_mtime_ns == stat.st_mtime_ns
+    assert messages[-1].endswith('内容和词典均未变化，跳过')
+
+    # 只有内容变化的帖子重新分析
+    metadata, posts = load_export(export_path)
+    posts[1]["comments"][0]["content"] = '割肉离场，卖出全部'
+    save_export(export_path, metadata, posts)
+    assert reanalyze([export_path], workers=1, log=messages.append)[export_path] == (1, 1)
+    assert load_export(export_path)[1][1]["comments"][0]["key_points"] == ['卖出']
+
+    # 词典变化后分析器版本不同，所有帖子重新分析
+    dictionary = write_dictionary(tmp_path, ['定投'])
+    assert reanalyze([export_path], dictionary_path=dictionary, workers=1, log=messages.append)[export_path] == (2, 2)
+    _, posts = load_export(export_path)
+    assert [post["comments"][0]["key_points"] for post in posts] == [['定投'], []]
+
+
+def test_failed_chunk_is_logged_and_retried(tmp_path, export_path):
+    metadata, posts = load_export(export_path)
+    broken = dict(posts[1])
+    del broken["link"]
+    save_export(export_path, metadata, [posts[0], broken])
+    other_path = str(tmp_path / 'v2ex_invest_20240703_20240703_ai.jsonl')
+    save_export(other_path, metadata, posts[:1])
+
+    messages = []
+    results = reanalyze([str(tmp_path)], workers=1, chunk_size=1, log=messages.append)
+    # 出错的块不影响同一文件的其他块和其他文件
+    assert results == {export_path: (1, 0), other_path: (1, 0)}
+    assert any('帖子 2 分析失败' in message for message in messages)
+    metadata, _ = load_export(export_path)
+    assert list(metadata["analysis"]["content_hashes"]) == ['1']
+
+    # 失败的帖子没有记录哈希，下次运行时重试
+    assert reanalyze([export_path], workers=1, log=messages.append)[export_path] == (0, 0)
+    assert sum('帖子 2 分析失败' in message for message in messages) == 2
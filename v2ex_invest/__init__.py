@@ -0,0 +1,5 @@
+"""V2EX投资板块帖子阅读器
+
+核心流水线位于 v2ex_invest.core，不依赖Qt；图形界面位于 v2ex_invest.gui，
+只在启动界面时才导入PyQt6。
+"""
@@ -0,0 +1,231 @@
+"""本地SQLite归档：保存导出过的帖子和评论并支持快速查询
+
+每个帖子正文（floor 为 0）和每条评论都是一条文档，文档的情感、标签和关键点
+都建了索引；全文检索使用FTS5。中文没有空格分词，写入前先把连续的汉字切成
+相邻两字的二元组（terms 列）和单字（chars 列），查询时按同样方式切分后做短语
+匹配，因此任意长度的中文关键词都能命中。
+"""
+import json
+import os
+import re
+import sqlite3
+
+ARCHIVE_PATH = os.path.join(os.path.expanduser('~'), '.v2ex_invest', 'archive.sqlite3')
+DEFAULT_QUERY_LIMIT = 50
+
+CJK_PATTERN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[A-Za-z0-9]+')
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def is_cjk(token):
+    return not token.isascii()
+
+
+def segment_text(text):
+    """把文本切分为 (terms, chars)：terms 为汉字二元组和英文/数字词，chars 为单个汉字"""
+    terms = []
+    chars = []
+    for token in CJK_PATTERN.findall(TAG_PATTERN.sub(' ', text or '')):
+        if is_cjk(token):
+            chars.extend(token)
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            terms.append(token.lower())
+    return ' '.join(terms), ' '.join(chars)
+
+
+def build_match_query(text):
+    """把查询文本转换为FTS5查询表达式，各个词之间是“且”的关系"""
+    clauses = []
+    for token in CJK_PATTERN.findall(text):
+        if not is_cjk(token):
+            clauses.append(f'terms : "{token.lower()}"')
+        elif len(token) == 1:
+            clauses.append(f'chars : "{token}"')
+        else:
+            bigrams = ' '.join(token[i:i + 2] for i in range(len(token) - 1))
+            clauses.append(f'terms : "{bigrams}"')
+    return ' AND '.join(clauses)
+
+
+class Archive:
+    """帖子归档库"""
+
+    def __init__(self, path=ARCHIVE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        try:
+            self.create_tables()
+        except sqlite3.Error:
+            # 如SQLite编译时没有FTS5
+            self.conn.close()
+            raise
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS posts (
+                    post_id TEXT PRIMARY KEY,
+                    title TEXT,
+                    author TEXT,
+                    published TEXT,
+                    published_date TEXT,
+                    link TEXT,
+                    tags TEXT
+                );
+                CREATE INDEX IF NOT EXISTS posts_published ON posts (published_date);
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id INTEGER PRIMARY KEY,
+                    post_id TEXT NOT NULL,
+                    floor INTEGER NOT NULL,
+                    author TEXT,
+                    content TEXT,
+                    is_author_comment INTEGER,
+                    sentiment TEXT,
+                    key_points TEXT,
+                    mentioned_floors TEXT,
+                    UNIQUE (post_id, floor)
+                );
+                CREATE INDEX IF NOT EXISTS documents_sentiment ON documents (sentiment);
+                CREATE TABLE IF NOT EXISTS terms (
+                    doc_id INTEGER NOT NULL,
+                    post_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    term TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS terms_lookup ON terms (kind, term);
+                CREATE INDEX IF NOT EXISTS terms_doc ON terms (doc_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5 (terms, chars);
+            ''')
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_post(self, ai_post):
+        """写入或更新一个帖子（generate_ai_post 的结果）及其全部评论"""
+        post_id = ai_post["id"]
+        with self.conn:
+            self.conn.execute(
+                '''INSERT INTO posts VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (post_id) DO UPDATE SET
+                       title = excluded.title, author = excluded.author, published = excluded.published,
+                       published_date = excluded.published_date, link = excluded.link, tags = excluded.tags''',
+                (post_id, ai_post["title"], ai_post["author"], ai_post["published"], ai_post["published"][:10],
+                 ai_post["link"], json.dumps(ai_post["tags"], ensure_ascii=False)))
+
+            # 评论整体替换，楼层可能因删帖而变化
+            old_ids = [row[0] for row in self.conn.execute(
+                'SELECT doc_id FROM documents WHERE post_id = ?', (post_id,))]
+            if old_ids:
+                placeholders = ','.join('?' * len(old_ids))
+                self.conn.execute(f'DELETE FROM documents_fts WHERE rowid IN ({placeholders})', old_ids)
+                self.conn.execute('DELETE FROM terms WHERE post_id = ?', (post_id,))
+                self.conn.execute('DELETE FROM documents WHERE post_id = ?', (post_id,))
+
+            doc_id = self.insert_document(post_id, 0, ai_post["author"], ai_post["summary"], False,
+                                          ai_post["sentiment"], ai_post["key_points"], [],
+                                          search_text=ai_post["title"] + ' ' + ai_post["summary"])
+            self.conn.executemany('INSERT INTO terms VALUES (?, ?, ?, ?)',
+                                  [(doc_id, post_id, 'tag', tag) for tag in ai_post["tags"]])
+
+            for comment in ai_post["comments"]:
+                self.insert_document(post_id, comment["floor"], comment["author"], comment["content"],
+                                     comment["is_author_comment"], comment["sentiment"],
+                                     comment["key_points"], comment["mentioned_floors"])
+
+    def insert_document(self, post_id, floor, author, content, is_author_comment, sentiment,
+                        key_points, mentioned_floors, search_text=None):
+        cursor = self.conn.execute(
+            'INSERT INTO documents VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (post_id, floor, author, content, int(is_author_comment), sentiment,
+             json.dumps(key_points, ensure_ascii=False), json.dumps(mentioned_floors)))
+        doc_id = cursor.lastrowid
+        terms, chars = segment_text(search_text if search_text is not None else content)
+        self.conn.execute('INSERT INTO documents_fts (rowid, terms, chars) VALUES (?, ?, ?)',
+                          (doc_id, terms, chars))
+        self.conn.executemany('INSERT INTO terms VALUES (?, ?, ?, ?)',
+                              [(doc_id, post_id, 'key_point', word) for word in key_points])
+        return doc_id
+
+    def search(self, text=None, sentiment=None, tag=None, key_point=None, author=None,
+               start_date=None, end_date=None, scope='all', limit=DEFAULT_QUERY_LIMIT):
+        """按条件查询帖子正文和评论，返回按发布时间倒序的结果列表
+
+        text 为全文检索关键词；tag 匹配帖子的标签（对该帖子下的评论同样生效）；
+        scope 为 all、posts 或 comments。
+        """
+        joins = []
+        conditions = []
+        params = []
+
+        match_query = build_match_query(text) if text else ''
+        if match_query:
+            joins.append('JOIN documents_fts ON documents_fts.rowid = d.doc_id')
+            conditions.append('documents_fts MATCH ?')
+            params.append(match_query)
+        if sentiment:
+            conditions.append('d.sentiment = ?')
+            params.append(sentiment)
+        if tag:
+            conditions.append("d.post_id IN (SELECT post_id FROM terms WHERE kind = 'tag' AND term = ?)")
+            params.append(tag)
+        if key_point:
+            conditions.append("d.doc_id IN (SELECT doc_id FROM terms WHERE kind = 'key_point' AND term = ?)")
+            params.append(key_point)
+        if author:
+            conditions.append('d.author = ?')
+            params.append(author)
+        if start_date:
+            conditions.append('p.published_date >= ?')
+            params.append(str(start_date))
+        if end_date:
+            conditions.append('p.published_date <= ?')
+            params.append(str(end_date))
+        if scope == 'posts':
+            conditions.append('d.floor = 0')
+        elif scope == 'comments':
+            conditions.append('d.floor > 0')
+
+        sql = f'''SELECT d.post_id, d.floor, p.title, d.author, p.published, p.link, d.sentiment,
+                         d.key_points, p.tags, d.content
+                  FROM documents d JOIN posts p ON p.post_id = d.post_id {' '.join(joins)}
+                  {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                  ORDER BY p.published DESC, d.floor
+                  LIMIT ?'''
+        params.append(limit)
+
+        results = []
+        for row in self.conn.execute(sql, params):
+            results.append({
+                "post_id": row[0],
+                "floor": row[1],
+                "title": row[2],
+                "author": row[3],
+                "published": row[4],
+                "link": row[5],
+                "sentiment": row[6],
+                "key_points": json.loads(row[7]),
+                "tags": json.loads(row[8]),
+                "content": row[9],
+            })
+        return results
+
+    def list_topics(self, start_date, end_date):
+        """返回日期范围内已归档的帖子，格式与 core.topic_from_api 一致"""
+        rows = self.conn.execute(
+            '''SELECT p.post_id, p.title, p.author, p.published, p.link, d.content
+               FROM posts p JOIN documents d ON d.post_id = p.post_id AND d.floor = 0
+               WHERE p.published_date BETWEEN ? AND ?
+               ORDER BY p.published DESC''',
+            (str(start_date), str(end_date)))
+        return [{"id": row[0], "title": row[1], "author": row[2], "published": row[3],
+                 "link": row[4], "summary": row[5], "version": None} for row in rows]
+
+    def get_comments(self, post_id):
+        """返回帖子的评论，格式与评论接口一致，便于复用导出流程"""
+        rows = self.conn.execute(
+            'SELECT author, content FROM documents WHERE post_id = ? AND floor > 0 ORDER BY floor',
+            (post_id,))
+        return [{"member": {"username": author}, "content": content} for author, content in rows]
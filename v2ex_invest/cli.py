@@ -0,0 +1,302 @@
+"""命令行入口：python -m v2ex_invest
+
+export 子命令在无界面环境下获取并导出帖子，加上 --daemon 后按固定间隔重复
+执行，可替代图形界面中的定时刷新，运行指标可写成Prometheus textfile或通过
+/metrics 提供；query 子命令查询本地归档；reanalyze 子命令用新词典重新分析
+已导出的AI JSON文件；gui 子命令才会导入PyQt6。
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from .archive import ARCHIVE_PATH, DEFAULT_QUERY_LIMIT, TAG_PATTERN, Archive
+from .core import (CACHE_PATH, DEFAULT_ANALYZER, DEFAULT_NODES, REPLY_FETCH_WORKERS, V2EX_BASE_URL, FeedExporter,
+                   TextAnalyzer)
+from .incremental import COMPACT_EVERY_RUNS, IncrementalExporter
+from .metrics import Metrics
+from .reanalyze import CHUNK_SIZE, reanalyze
+from .transport import HOURLY_QUOTA
+
+EXPORT_FORMATS = ['html', 'ai-json', 'ai-jsonl', 'site']
+DEFAULT_DAYS = 7             # 未指定日期范围时导出最近几天
+DEFAULT_INTERVAL = 3600      # 守护模式下两次导出之间的间隔（秒）
+SNIPPET_LENGTH = 80          # 查询结果中显示的内容长度
+PROFILE_TOP = 25             # --profile 时打印的函数数
+SEGMENTER_NAMES = ['ngram', 'jieba']
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'日期格式应为 YYYY-MM-DD: {value}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m v2ex_invest', description='V2EX投资帖子阅读器')
+    subparsers = parser.add_subparsers(dest='command')
+
+    export_parser = subparsers.add_parser('export', help='获取并导出帖子（无界面）')
+    export_parser.add_argument('--start', type=parse_date, help='开始日期 YYYY-MM-DD')
+    export_parser.add_argument('--end', type=parse_date, help='结束日期 YYYY-MM-DD，默认今天')
+    export_parser.add_argument('--days', type=int, default=DEFAULT_DAYS,
+                               help=f'未指定 --start 时导出最近几天（默认{DEFAULT_DAYS}）')
+    export_parser.add_argument('-o', '--output-dir', default=os.getcwd(), help='导出目录，默认当前目录')
+    export_parser.add_argument('-f', '--format', nargs='+', choices=EXPORT_FORMATS, default=['html', 'ai-json'],
+                               dest='formats', help='导出格式（默认 html ai-json），site 为分片加载的网页目录')
+    export_parser.add_argument('--source', choices=['api', 'feed', 'archive'], default='api',
+                               help='api：分页读取节点帖子列表，可回溯历史；feed：只读取RSS feed中的最新帖子；'
+                                    'archive：从本地归档导出，不访问网络')
+    export_parser.add_argument('--nodes', nargs='+', default=DEFAULT_NODES,
+                               help=f'使用 api 来源时读取的节点（默认 {" ".join(DEFAULT_NODES)}）')
+    export_parser.add_argument('--cache', default=CACHE_PATH, help='本地缓存文件路径')
+    export_parser.add_argument('--no-cache', action='store_true', help='不使用本地缓存')
+    export_parser.add_argument('--archive', default=ARCHIVE_PATH, help='本地归档文件路径')
+    export_parser.add_argument('--no-archive', action='store_true', help='不写入本地归档')
+    export_parser.add_argument('--workers', type=int, default=REPLY_FETCH_WORKERS,
+                               help=f'并发请求数（默认{REPLY_FETCH_WORKERS}）')
+    export_parser.add_argument('--requests-per-hour', type=int, default=HOURLY_QUOTA,
+                               help=f'每小时最多发送的请求数，0 为不限速（默认{HOURLY_QUOTA}，即V2EX API每个IP的配额）')
+    export_parser.add_argument('--base-url', default=V2EX_BASE_URL, help=argparse.SUPPRESS)
+    export_parser.add_argument('--dictionary', help='词典JSON文件（key_point_words、positive_words 等）')
+    export_parser.add_argument('--corpus-keywords', action='store_true',
+                               help='导出后对本次所有帖子和评论计算TF-IDF，补充AI JSON中的关键点和标签（需要numpy、scipy）')
+    export_parser.add_argument('--segmenter', choices=SEGMENTER_NAMES, default='ngram',
+                               help='--corpus-keywords 使用的分词方式：ngram 为汉字n元组，jieba 需要另外安装')
+    export_parser.add_argument('--incremental', action='store_true',
+                               help='增量导出：只追加新帖子和新楼层到增量日志，定期合并为完整快照')
+    export_parser.add_argument('--compact-every', type=int, default=COMPACT_EVERY_RUNS,
+                               help=f'增量导出时每隔多少次运行合并一次增量日志（默认{COMPACT_EVERY_RUNS}）')
+    export_parser.add_argument('--compact', action='store_true', help='增量导出后立即合并增量日志')
+    export_parser.add_argument('--daemon', action='store_true', help='守护模式，按固定间隔重复导出')
+    export_parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL,
+                               help=f'守护模式的导出间隔秒数（默认{DEFAULT_INTERVAL}）')
+    export_parser.add_argument('--metrics-file', help='每次导出后写出Prometheus textfile格式的指标')
+    export_parser.add_argument('--metrics-port', type=int, help='守护模式下在本地端口提供 /metrics 接口')
+    export_parser.add_argument('--json-log', help='以JSON Lines格式追加每次运行的摘要和重试、失败事件')
+    export_parser.add_argument('--profile', help='用cProfile分析单次导出，结果保存到该文件')
+    export_parser.set_defaults(func=run_export)
+
+    query_parser = subparsers.add_parser('query', help='查询本地归档中的帖子和评论')
+    query_parser.add_argument('text', nargs='?', help='全文检索关键词，多个词用空格分隔')
+    query_parser.add_argument('--sentiment', choices=['positive', 'negative', 'neutral'], help='情感倾向')
+    query_parser.add_argument('--tag', help='帖子标签')
+    query_parser.add_argument('--key-point', help='关键点')
+    query_parser.add_argument('--author', help='作者用户名')
+    query_parser.add_argument('--start', type=parse_date, help='开始日期 YYYY-MM-DD')
+    query_parser.add_argument('--end', type=parse_date, help='结束日期 YYYY-MM-DD')
+    query_parser.add_argument('--scope', choices=['all', 'posts', 'comments'], default='all',
+                              help='查询范围：全部、仅帖子正文或仅评论（默认全部）')
+    query_parser.add_argument('--limit', type=int, default=DEFAULT_QUERY_LIMIT,
+                              help=f'最多返回的结果数（默认{DEFAULT_QUERY_LIMIT}）')
+    query_parser.add_argument('--json', action='store_true', help='以JSON Lines格式输出结果')
+    query_parser.add_argument('--archive', default=ARCHIVE_PATH, help='本地归档文件路径')
+    query_parser.set_defaults(func=run_query)
+
+    reanalyze_parser = subparsers.add_parser('reanalyze', help='用当前词典重新分析已导出的AI JSON文件（不访问网络）')
+    reanalyze_parser.add_argument('paths', nargs='+', help='*_ai.json / *_ai.jsonl 文件或包含它们的目录')
+    reanalyze_parser.add_argument('--dictionary', help='词典JSON文件（key_point_words、positive_words 等）')
+    reanalyze_parser.add_argument('--workers', type=int, help='进程数，默认为CPU核数')
+    reanalyze_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                                  help=f'每个任务包含的帖子数（默认{CHUNK_SIZE}）')
+    reanalyze_parser.add_argument('--force', action='store_true', help='忽略内容哈希，重新分析所有帖子')
+    reanalyze_parser.add_argument('--corpus-keywords', action='store_true',
+                                  help='重新分析后按这些文件的语料计算TF-IDF，补充关键点和标签')
+    reanalyze_parser.add_argument('--segmenter', choices=SEGMENTER_NAMES, default='ngram',
+                                  help='--corpus-keywords 使用的分词方式')
+    reanalyze_parser.set_defaults(func=run_reanalyze)
+
+    gui_parser = subparsers.add_parser('gui', help='启动图形界面')
+    gui_parser.set_defaults(func=run_gui)
+
+    return parser
+
+
+def date_range(args):
+    """根据参数计算本次导出的日期范围；使用 --days 时每次都相对今天计算"""
+    end_date = args.end or date.today()
+    start_date = args.start or end_date - timedelta(days=args.days - 1)
+    return start_date, end_date
+
+
+def create_keyword_extractor(args):
+    """按需导入 numpy/scipy，未启用语料关键词时不加载"""
+    if not args.corpus_keywords:
+        return None
+    from .keywords import SEGMENTERS, CorpusKeywordExtractor
+    return CorpusKeywordExtractor(segmenter=SEGMENTERS[args.segmenter]())
+
+
+def load_analyzer(args):
+    return TextAnalyzer.from_file(args.dictionary) if args.dictionary else None
+
+
+def export_once(args, metrics, is_cancelled=None):
+    start_date, end_date = date_range(args)
+    keyword_extractor = create_keyword_extractor(args)
+    options = {}
+    exporter_class = FeedExporter
+    if args.incremental:
+        exporter_class = IncrementalExporter
+        options = {"compact_every": args.compact_every, "force_compact": args.compact,
+                   "window_days": args.days if args.start is None and args.end is None else None}
+    exporter = exporter_class(start_date, end_date, args.output_dir,
+                              export_html='html' in args.formats,
+                              export_ai_json='ai-json' in args.formats,
+                              export_ai_jsonl='ai-jsonl' in args.formats,
+                              export_site='site' in args.formats,
+                              nodes=args.nodes if args.source == 'api' else None,
+                              base_url=args.base_url,
+                              workers=args.workers,
+                              requests_per_hour=args.requests_per_hour,
+                              cache_path=None if args.no_cache else args.cache,
+                              archive_path=None if args.no_archive and args.source != 'archive' else args.archive,
+                              from_archive=args.source == 'archive',
+                              analyzer=load_analyzer(args),
+                              keyword_extractor=keyword_extractor,
+                              metrics=metrics,
+                              is_cancelled=is_cancelled,
+                              **options)
+    try:
+        exporter.run()
+    finally:
+        if keyword_extractor is not None:
+            keyword_extractor.close()
+    if args.metrics_file:
+        metrics.write_textfile(args.metrics_file)
+    return exporter.error is None
+
+
+def profile_export(args, metrics):
+    """在cProfile下运行单次导出，保存结果并打印累计耗时最多的函数"""
+    profiler = cProfile.Profile()
+    succeeded = profiler.runcall(export_once, args, metrics)
+    profiler.dump_stats(args.profile)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    print(f'性能分析结果已保存: {args.profile}', file=sys.stderr)
+    return succeeded
+
+
+def run_export(args):
+    if not os.path.isdir(args.output_dir):
+        print(f'导出目录不存在: {args.output_dir}', file=sys.stderr)
+        return 2
+    start_date, end_date = date_range(args)
+    if start_date > end_date:
+        print('开始日期不能晚于结束日期', file=sys.stderr)
+        return 2
+    if args.source == 'archive' and not os.path.exists(args.archive):
+        print(f'归档文件不存在: {args.archive}', file=sys.stderr)
+        return 2
+    if args.workers < 1 or args.requests_per_hour < 0:
+        print('--workers 至少为 1，--requests-per-hour 不能为负数', file=sys.stderr)
+        return 2
+    if args.incremental and set(args.formats) == {'site'}:
+        print('增量导出不支持分片网页格式，请同时选择 html、ai-json 或 ai-jsonl', file=sys.stderr)
+        return 2
+    if args.profile and args.daemon:
+        print('--profile 只能用于单次导出', file=sys.stderr)
+        return 2
+    try:
+        load_analyzer(args)
+    except (OSError, ValueError) as e:
+        print(f'读取词典失败: {e}', file=sys.stderr)
+        return 2
+    if args.corpus_keywords:
+        try:
+            create_keyword_extractor(args).close()
+        except ImportError as e:
+            print(f'--corpus-keywords 需要安装 {e.name}', file=sys.stderr)
+            return 2
+
+    metrics = Metrics(json_log_path=args.json_log)
+    if args.profile:
+        return 0 if profile_export(args, metrics) else 1
+    if not args.daemon:
+        return 0 if export_once(args, metrics) else 1
+
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+
+    # 收到 SIGINT/SIGTERM 时取消当前任务并退出
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    while not stop.is_set():
+        export_once(args, metrics, is_cancelled=stop.is_set)
+        stop.wait(args.interval)
+    return 0
+
+
+def run_query(args):
+    if not os.path.exists(args.archive):
+        print(f'归档文件不存在: {args.archive}', file=sys.stderr)
+        return 2
+    archive = Archive(args.archive)
+    try:
+        start = time.perf_counter()
+        results = archive.search(args.text, sentiment=args.sentiment, tag=args.tag, key_point=args.key_point,
+                                 author=args.author, start_date=args.start, end_date=args.end,
+                                 scope=args.scope, limit=args.limit)
+        elapsed = time.perf_counter() - start
+    finally:
+        archive.close()
+
+    for item in results:
+        if args.json:
+            print(json.dumps(item, ensure_ascii=False))
+            continue
+        location = '正文' if item["floor"] == 0 else f'#{item["floor"]}'
+        snippet = ' '.join(TAG_PATTERN.sub(' ', item["content"] or '').split())[:SNIPPET_LENGTH]
+        print(f'{item["published"][:10]} [{item["sentiment"]}] {item["title"]} {location} @{item["author"]}')
+        print(f'    {snippet}')
+        print(f'    {item["link"]}')
+    print(f'共 {len(results)} 条结果，用时 {elapsed * 1000:.1f} ms', file=sys.stderr)
+    return 0
+
+
+def run_reanalyze(args):
+    start = time.perf_counter()
+    try:
+        keyword_extractor = create_keyword_extractor(args)
+    except ImportError as e:
+        print(f'--corpus-keywords 需要安装 {e.name}', file=sys.stderr)
+        return 2
+    results = reanalyze(args.paths, dictionary_path=args.dictionary, workers=args.workers,
+                        chunk_size=args.chunk_size, force=args.force)
+    analyzed = sum(count for count, _ in results.values())
+    changed = sum(count for _, count in results.values())
+    print(f'共 {len(results)} 个文件，重新分析 {analyzed} 个帖子，{changed} 个结果有变化，'
+          f'用时 {time.perf_counter() - start:.1f} 秒')
+    if keyword_extractor is not None:
+        try:
+            start = time.perf_counter()
+            analyzer = TextAnalyzer.from_file(args.dictionary) if args.dictionary else DEFAULT_ANALYZER
+            keyword_extractor.enrich_exports(list(results), analyzer)
+        finally:
+            keyword_extractor.close()
+        print(f'已补充 {len(results)} 个文件的关键词和标签，用时 {time.perf_counter() - start:.1f} 秒')
+    return 0
+
+
+def run_gui(args):
+    from .gui import main as gui_main
+    gui_main()
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    return args.func(args)
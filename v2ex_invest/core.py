@@ -0,0 +1,1024 @@
+"""V2EX投资板块帖子的获取、分析和导出，不依赖Qt
+
+图形界面（v2ex_invest.gui）和命令行（python -m v2ex_invest）共用这里的流水线。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import feedparser
+import requests
+
+from .archive import ARCHIVE_PATH, Archive
+from .metrics import Metrics
+from .models import NO_CONTENT, Comment, Post, intern_name
+from .site_export import SiteExportWriter
+from .transport import HOURLY_QUOTA, POOL_SIZE, HttpTransport, RequestCancelled, quota_rate
+
+V2EX_BASE_URL = 'https://www.v2ex.com'
+
+REPLY_FETCH_WORKERS = 4      # 并发获取评论的线程数
+
+# 通过节点帖子列表接口回溯历史帖子
+DEFAULT_NODES = ['invest']
+MAX_TOPIC_PAGES = 50         # 每个节点最多读取的页数
+TOPIC_PAGE_BATCH = 4         # 每轮最多并发读取的页数
+
+# 本地缓存设置
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.v2ex_invest', 'cache.sqlite3')
+CACHE_TTL_DAYS = 30          # 超过该天数未被访问的帖子缓存将被清理
+CACHE_MAX_TOPICS = 5000      # 最多缓存的帖子数，超出时清理最久未访问的
+
+EXPORT_BUFFER_SIZE = 64 * 1024   # 导出文件的写缓冲区大小
+
+# 文本分析使用的默认词典
+KEY_POINT_WORDS = ['投资', '股票', '基金', '市场', '收益', '风险', '分析', '建议', '推荐', '买入', '卖出', '涨', '跌']
+POSITIVE_WORDS = ['好', '涨', '赚', '推荐', '买入', '看好', '收益', '机会', '利好']
+NEGATIVE_WORDS = ['差', '跌', '亏', '风险', '卖出', '看空', '利空', '危险', '亏损']
+TAG_WORDS = ['A股', '港股', '美股', '基金', '股票', '投资', '理财', '加密货币', '比特币', '黄金', '房地产']
+MAX_KEY_POINTS = 5           # 每段文本最多返回的关键词数
+MAX_FALLBACK_TAGS = 3        # 没有匹配到预定义标签时最多返回的标签数
+ANALYZER_VERSION = 1         # 分析逻辑变化时递增，重新分析时据此判断已有结果是否过期
+
+# 评论中的 @#楼层号 或 @用户名
+MENTION_PATTERN = re.compile(r'@(?:#(\d+)|([A-Za-z0-9_-]+))')
+
+# HTML导出的页头
+HTML_STYLES = [
+    'body { font-family: Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; }',
+    '.post { background: #fff; border: 1px solid #ddd; border-radius: 5px; padding: 20px; margin-bottom: 20px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }',
+    '.post-title { font-size: 1.4em; color: #333; margin-bottom: 10px; }',
+    '.post-meta { color: #666; font-size: 0.9em; margin-bottom: 15px; }',
+    '.post-content { margin-bottom: 20px; }',
+    '.comments { background: #f9f9f9; padding: 15px; border-radius: 5px; }',
+    '.comment { border-bottom: 1px solid #eee; padding: 10px 0; position: relative; }',
+    '.comment:last-child { border-bottom: none; }',
+    '.comment-floor { position: absolute; right: 10px; top: 10px; color: #999; font-size: 0.9em; }',
+    '.author-comment { color: #ff4444; }',
+]
+
+HTML_HEADER = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8">', '<style>'] + HTML_STYLES + [
+    '</style>',
+    '</head><body>',
+]
+
+
+class ReplyFetcher:
+    """使用有界线程池并发获取帖子评论，请求经由共享的 HttpTransport"""
+
+    def __init__(self, transport, base_url=V2EX_BASE_URL, max_workers=REPLY_FETCH_WORKERS):
+        self.transport = transport
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+
+    def fetch_one(self, topic_id):
+        """获取单个帖子的评论，重试由传输层负责
+
+        返回字典：comments 为评论列表（失败时为 None），error 为失败原因，
+        messages 为需要记录的 (日志, 级别) 列表。
+        """
+        comments_url = f'{self.base_url}/api/replies/show.json?topic_id={topic_id}'
+        result = {"topic_id": topic_id, "comments": None, "error": None,
+                  "messages": [('正在获取评论...', logging.DEBUG)]}
+        log = lambda message, level: result["messages"].append((message, level))
+        
+        try:
+            # 在获取线程中就转换为 Comment，原始字典随即释放
+            result["comments"] = comments_from_replies(
+                self.transport.get(comments_url, parse=parse_replies, log=log))
+        except requests.Timeout:
+            result["error"] = '请求超时'
+            log('获取评论失败：请求超时', logging.WARNING)
+        except Exception as e:
+            result["error"] = str(e)
+            log(f'获取评论失败：{str(e)}', logging.WARNING)
+        
+        return result
+
+    def fetch_all(self, topic_ids):
+        """并发获取多个帖子的评论，按 topic_ids 的顺序逐个产出结果"""
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            yield from executor.map(self.fetch_one, topic_ids)
+        finally:
+            # 提前结束（如任务被取消）时丢弃尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_replies(response):
+    """解析评论接口的响应，格式不对时抛出 ValueError 以便重试"""
+    comments = response.json()
+    if not isinstance(comments, list):
+        raise ValueError(f'无法解析评论数据: {comments}')
+    return comments
+
+
+def topic_id_from_link(link):
+    """从帖子链接中取出帖子ID，忽略 #reply 等锚点"""
+    return urlparse(link).path.rstrip('/').split('/')[-1]
+
+
+def topic_from_feed_entry(entry):
+    """把feed条目转换为统一的帖子字典"""
+    return {
+        "id": topic_id_from_link(entry.link),
+        "title": entry.title,
+        "author": entry.author,
+        "published": entry.published,
+        "link": entry.link,
+        "summary": entry.description,
+        # feed的更新时间随新回复变化，用作评论缓存的版本标记
+        "version": entry.get('updated', entry.published),
+    }
+
+
+def topic_from_api(item):
+    """把节点帖子列表接口返回的条目转换为统一的帖子字典"""
+    return {
+        "id": str(item["id"]),
+        "title": item.get("title", ""),
+        "author": item.get("member", {}).get("username", ""),
+        "published": datetime.fromtimestamp(item["created"], timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        "link": item.get("url") or f'{V2EX_BASE_URL}/t/{item["id"]}',
+        "summary": item.get("content_rendered") or item.get("content", ""),
+        # 回复数或最后回复时间变化时才重新获取评论
+        "version": f'{item.get("replies", 0)}:{item.get("last_touched", item["created"])}',
+    }
+
+
+def parse_topic_list(response):
+    """解析节点帖子列表接口的响应，格式不对时抛出 ValueError 以便重试"""
+    items = response.json()
+    if not isinstance(items, list):
+        raise ValueError(f'无法解析帖子列表: {items}')
+    return items
+
+
+class TopicLister:
+    """按页读取一个或多个节点的帖子列表，直到早于开始日期
+
+    列表按最后回复时间倒序排列，一旦某页所有帖子的最后活动时间都早于开始日期，
+    后面的页也不可能再有符合条件的帖子，即可停止；每个节点最多读取
+    max_pages 页，因此请求数有明确上限。
+
+    多数日期范围只需要一两页，因此每轮并发读取的页数不超过该节点已读取的页数
+    （1、1、2、4……，最多 batch 页），不会为很快结束的节点多发请求；某页的第一个
+    帖子与之前某页相同时（接口忽略了页码），停止该节点。
+    """
+
+    def __init__(self, transport, base_url=V2EX_BASE_URL, nodes=DEFAULT_NODES,
+                 max_pages=MAX_TOPIC_PAGES, batch=TOPIC_PAGE_BATCH, max_workers=REPLY_FETCH_WORKERS):
+        self.transport = transport
+        self.base_url = base_url.rstrip('/')
+        self.nodes = list(nodes)
+        self.max_pages = max_pages
+        self.batch = batch
+        self.max_workers = max_workers
+
+    def fetch_page(self, node, page):
+        url = f'{self.base_url}/api/topics/show.json?node_name={node}&p={page}'
+        return self.transport.get(url, parse=parse_topic_list)
+
+    def list_topics(self, start_date, end_date, log=None, is_cancelled=None):
+        """返回日期范围内的帖子（按发布时间倒序，跨节点去重）"""
+        log = log or (lambda message, level=logging.INFO: None)
+        is_cancelled = is_cancelled or (lambda: False)
+        start_ts = datetime(start_date.year, start_date.month, start_date.day, tzinfo=timezone.utc).timestamp()
+        topics = {}
+        next_page = {node: 1 for node in self.nodes}
+        pages_read = {node: 0 for node in self.nodes}
+        first_ids = {node: set() for node in self.nodes}
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while next_page and not is_cancelled():
+                batch_size = {node: min(self.batch, max(1, pages_read[node])) for node in next_page}
+                jobs = [(node, page) for node, first in next_page.items()
+                        for page in range(first, min(first + batch_size[node], self.max_pages + 1))]
+                futures = [executor.submit(self.fetch_page, node, page) for node, page in jobs]
+                finished = set()
+                
+                for (node, page), future in zip(jobs, futures):
+                    if node in finished:
+                        future.cancel()
+                        continue
+                    try:
+                        page_result = future.result()
+                    except RequestCancelled:
+                        finished.add(node)
+                        continue
+                    except Exception as e:
+                        log(f'节点 {node} 第 {page} 页获取失败: {e}', logging.WARNING)
+                        finished.add(node)
+                        continue
+                    
+                    pages_read[node] += 1
+                    if not page_result:
+                        finished.add(node)
+                        continue
+                    if page_result[0].get("id") in first_ids[node]:
+                        log(f'节点 {node} 第 {page} 页与之前的页相同，接口可能不支持分页，停止回溯', logging.WARNING)
+                        finished.add(node)
+                        continue
+                    first_ids[node].add(page_result[0].get("id"))
+                    
+                    for item in page_result:
+                        topic = topic_from_api(item)
+                        published_date = datetime.strptime(topic["published"], '%Y-%m-%dT%H:%M:%SZ').date()
+                        if start_date <= published_date <= end_date:
+                            topics.setdefault(topic["id"], topic)
+                    
+                    # 本页最活跃的帖子也早于开始日期，后面的页无需再读
+                    last_active = max(max(item.get("last_touched", 0), item["created"]) for item in page_result)
+                    if last_active < start_ts:
+                        finished.add(node)
+                
+                for node in list(next_page):
+                    next_page[node] += batch_size[node]
+                    if node in finished:
+                        del next_page[node]
+                    elif next_page[node] > self.max_pages:
+                        log(f'节点 {node} 已达到最大页数 {self.max_pages}，停止回溯', logging.WARNING)
+                        del next_page[node]
+        
+        for node in self.nodes:
+            log(f'节点 {node}: 读取 {pages_read[node]} 页')
+        return sorted(topics.values(), key=lambda topic: topic["published"], reverse=True)
+
+
+class TopicCache:
+    """基于SQLite的本地缓存，保存feed内容和各帖子的评论
+
+    feed 使用 ETag/Last-Modified 条件请求；评论按帖子的版本标记（如feed中的
+    更新时间）判断是否需要重新获取。
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl_days=CACHE_TTL_DAYS, max_topics=CACHE_MAX_TOPICS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.ttl_days = ttl_days
+        self.max_topics = max_topics
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS feeds (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB,
+                fetched_at REAL
+            )''')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS replies (
+                topic_id TEXT PRIMARY KEY,
+                version TEXT,
+                comments TEXT,
+                fetched_at REAL,
+                accessed_at REAL
+            )''')
+
+    def close(self):
+        self.conn.close()
+
+    def get_feed(self, url):
+        """返回缓存的 (etag, last_modified, body)，没有缓存时返回 None"""
+        return self.conn.execute(
+            'SELECT etag, last_modified, body FROM feeds WHERE url = ?', (url,)).fetchone()
+
+    def put_feed(self, url, etag, last_modified, body):
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO feeds VALUES (?, ?, ?, ?, ?)',
+                (url, etag, last_modified, body, time.time()))
+
+    def get_replies(self, topic_id, version):
+        """版本一致时返回缓存的评论列表，否则返回 None"""
+        row = self.conn.execute(
+            'SELECT version, comments FROM replies WHERE topic_id = ?', (topic_id,)).fetchone()
+        if row is None or row[0] != version:
+            return None
+        with self.conn:
+            self.conn.execute(
+                'UPDATE replies SET accessed_at = ? WHERE topic_id = ?', (time.time(), topic_id))
+        return json.loads(row[1])
+
+    def put_replies(self, topic_id, version, comments):
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?, ?)',
+                (topic_id, version, json.dumps(comments, ensure_ascii=False), now, now))
+
+    def evict(self):
+        """清理过期以及超出容量的评论缓存，返回清理的条数"""
+        expire_before = time.time() - self.ttl_days * 86400
+        with self.conn:
+            removed = self.conn.execute(
+                'DELETE FROM replies WHERE accessed_at < ?', (expire_before,)).rowcount
+            removed += self.conn.execute(
+                '''DELETE FROM replies WHERE topic_id NOT IN (
+                    SELECT topic_id FROM replies ORDER BY accessed_at DESC LIMIT ?
+                )''', (self.max_topics,)).rowcount
+        return removed
+
+
+
+class StreamingWriter:
+    """逐个帖子写出的导出文件
+
+    内容先写入 .part 临时文件并在每个帖子后刷新，完成后再改名为正式文件名；
+    中途崩溃时 .part 文件保留已写出的部分。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.part_path = path + '.part'
+        self.file = open(self.part_path, 'w', encoding='utf-8', buffering=EXPORT_BUFFER_SIZE)
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def write_footer(self):
+        pass
+
+    def commit(self):
+        """写入结尾并改名为正式文件"""
+        self.write_footer()
+        self.file.close()
+        os.replace(self.part_path, self.path)
+
+    def close(self):
+        """关闭文件但保留已写出的部分"""
+        if not self.file.closed:
+            self.file.close()
+
+    def discard(self):
+        """关闭并删除临时文件"""
+        self.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+
+class HtmlExportWriter(StreamingWriter):
+    """HTML格式导出"""
+    format_name = 'html'
+
+    def write_header(self):
+        self.file.write('\n'.join(HTML_HEADER))
+
+    def write_post(self, html_lines):
+        self.file.write('\n' + '\n'.join(html_lines))
+        self.file.flush()
+
+    def write_footer(self):
+        self.file.write('\n</body></html>')
+
+
+class AiJsonWriter(StreamingWriter):
+    """AI阅读JSON格式导出，输出与 json.dump(indent=2) 一致"""
+    format_name = 'ai_json'
+
+    def __init__(self, path, metadata):
+        self.metadata = metadata
+        self.post_count = 0
+        super().__init__(path)
+
+    def write_header(self):
+        metadata = json.dumps(self.metadata, ensure_ascii=False, indent=2)
+        self.file.write('{\n  "metadata": ' + textwrap.indent(metadata, '  ').lstrip() + ',\n  "posts": [')
+
+    def write_post(self, ai_post):
+        if self.post_count:
+            self.file.write(',')
+        self.file.write('\n' + textwrap.indent(json.dumps(ai_post, ensure_ascii=False, indent=2), '    '))
+        self.file.flush()
+        self.post_count += 1
+
+    def write_footer(self):
+        self.file.write('\n  ]\n}' if self.post_count else ']\n}')
+
+
+class AiJsonLinesWriter(StreamingWriter):
+    """AI阅读JSON Lines格式导出：首行为元数据，之后每行一个帖子"""
+    format_name = 'ai_jsonl'
+
+    def __init__(self, path, metadata):
+        self.metadata = metadata
+        super().__init__(path)
+
+    def write_header(self):
+        self.file.write(json.dumps({"metadata": self.metadata}, ensure_ascii=False) + '\n')
+
+    def write_post(self, ai_post):
+        self.file.write(json.dumps(ai_post, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+
+
+class KeywordMatcher:
+    """多模式关键词匹配器
+
+    把所有词编译成一个按字典树组织的正则，由正则引擎在C层面跳过不可能匹配的
+    字符，每个命中位置取最长的词；被最长词包含的其他词（如“亏损”中的“亏”）
+    通过预先计算的包含关系补上，因此一次扫描即可得到文本中出现的全部词。
+    """
+
+    def __init__(self, words):
+        self.words = sorted(set(word for word in words if word))
+        self.search = re.compile(self.build_trie_pattern(self.words)).search if self.words else None
+        self.contained = {}
+        for word in self.words:
+            inner = frozenset(other for other in self.words if other != word and other in word)
+            if inner:
+                self.contained[word] = inner
+
+    @staticmethod
+    def build_trie_pattern(words):
+        """把词表转换为字典树形式的正则表达式，同一位置优先匹配最长的词"""
+        trie = {}
+        for word in words:
+            node = trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[''] = {}
+
+        def build(node):
+            branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 and '' not in node else '(?:%s)' % '|'.join(branches)
+            return '(?:%s)?' % body if '' in node else body
+
+        return build(trie)
+
+    def match(self, text):
+        """返回文本中出现的所有词的集合"""
+        found = set()
+        if not text or self.search is None:
+            return found
+        
+        # 从每个命中位置的下一个字符继续查找，以便发现相互重叠的词
+        search = self.search
+        hit = search(text)
+        while hit:
+            found.add(hit.group())
+            hit = search(text, hit.start() + 1)
+        
+        if self.contained and not found.isdisjoint(self.contained):
+            for word in found & self.contained.keys():
+                found |= self.contained[word]
+        return found
+
+
+class TextAnalyzer:
+    """基于词典的关键词、情感和标签分析，每段文本只扫描一次"""
+
+    def __init__(self, key_point_words=KEY_POINT_WORDS, positive_words=POSITIVE_WORDS,
+                 negative_words=NEGATIVE_WORDS, tag_words=TAG_WORDS):
+        self.key_point_words = list(key_point_words)
+        self.positive_words = frozenset(positive_words)
+        self.negative_words = frozenset(negative_words)
+        self.tag_words = list(tag_words)
+        self.matcher = KeywordMatcher(self.key_point_words + list(self.positive_words) +
+                                      list(self.negative_words) + self.tag_words)
+        # 分析逻辑版本加词典指纹，词典变化后已有的分析结果即视为过期
+        dictionaries = json.dumps([self.key_point_words, sorted(self.positive_words),
+                                   sorted(self.negative_words), self.tag_words], ensure_ascii=False)
+        self.version = f'{ANALYZER_VERSION}:{hashlib.sha1(dictionaries.encode("utf-8")).hexdigest()[:12]}'
+
+    @classmethod
+    def from_file(cls, path):
+        """从JSON文件加载词典，文件中缺少的词典使用默认值"""
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(key_point_words=config.get('key_point_words', KEY_POINT_WORDS),
+                   positive_words=config.get('positive_words', POSITIVE_WORDS),
+                   negative_words=config.get('negative_words', NEGATIVE_WORDS),
+                   tag_words=config.get('tag_words', TAG_WORDS))
+
+    def match(self, text):
+        return self.matcher.match(text)
+
+    def key_points(self, matches):
+        """按词典顺序返回命中的关键词"""
+        return [word for word in self.key_point_words if word in matches][:MAX_KEY_POINTS]
+
+    def sentiment(self, matches):
+        positive_count = len(self.positive_words & matches)
+        negative_count = len(self.negative_words & matches)
+        
+        if positive_count > negative_count + 2:
+            return "positive"
+        elif negative_count > positive_count + 2:
+            return "negative"
+        else:
+            return "neutral"
+
+    def tags(self, title, content, content_matches=None):
+        """从标题和内容中提取标签，已匹配过的内容可通过 content_matches 传入"""
+        if content_matches is None:
+            content_matches = self.match(content)
+        matches = content_matches | self.match(title)
+        tags = [tag for tag in self.tag_words if tag in matches]
+        
+        # 如果没有找到预定义标签，提取一些关键词
+        if not tags:
+            words = (title + " " + content).split()
+            important_words = [w for w in words if len(w) > 1 and w.isalnum()]
+            # 按出现顺序去重，结果不随进程的哈希种子变化
+            tags = list(dict.fromkeys(important_words))[:MAX_FALLBACK_TAGS]
+        
+        return tags
+
+
+DEFAULT_ANALYZER = TextAnalyzer()
+
+
+def analyze_post(post, analyzer=DEFAULT_ANALYZER):
+    """生成单个帖子的AI JSON数据，每段文本只做一次关键词匹配
+
+    post 可以是导出时收集的帖子数据，也可以是已导出的AI JSON帖子（重新分析时）。
+    """
+    return Post.from_dict(post, analyzer).to_ai_dict()
+
+
+def resolve_mentions(comments):
+    """一次遍历整个楼层，把评论中的@用户名替换为@楼层号
+
+    用户名按整词匹配，只替换该楼层及之前出现过的用户（取其最近一次发言的楼层）。
+    返回与 comments 一一对应的 (替换后的内容, 提到的楼层列表)，楼层列表同时
+    包含原文中直接写出的 @#楼层号。
+    """
+    username_to_floor = {}
+    resolved = []
+    
+    for floor, comment in enumerate(comments, 1):
+        username = comment.get('member', {}).get('username')
+        if username:
+            username_to_floor[username] = floor
+        
+        content = comment.get('content', '无内容')
+        mentioned_floors = []
+        if '@' in content:
+            def replace(match):
+                if match.group(1) is not None:
+                    mentioned_floors.append(int(match.group(1)))
+                    return match.group(0)
+                mentioned_floor = username_to_floor.get(match.group(2))
+                if mentioned_floor is None:
+                    return match.group(0)
+                mentioned_floors.append(mentioned_floor)
+                return f'@#{mentioned_floor}'
+            
+            content = MENTION_PATTERN.sub(replace, content)
+        resolved.append((content, mentioned_floors))
+    
+    return resolved
+
+
+def comments_from_replies(replies):
+    """把评论接口返回的原始字典转换为 Comment 列表，同时解析@用户名"""
+    comments = []
+    for floor, (reply, (rendered, mentioned_floors)) in enumerate(zip(replies, resolve_mentions(replies)), 1):
+        comments.append(Comment(floor=floor,
+                                username=intern_name(reply.get('member', {}).get('username')),
+                                content=reply.get('content', NO_CONTENT),
+                                rendered=rendered,
+                                mentioned_floors=tuple(mentioned_floors)))
+    return comments
+
+
+def format_log_line(message):
+    """为日志消息加上时间戳"""
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return f'[{current_time}] {message}'
+
+
+class FeedExporter:
+    """获取、解析并导出帖子的流水线，不依赖Qt，可在后台线程中运行"""
+
+    def __init__(self, start_date, end_date, export_dir, export_html=True, export_ai_json=True,
+                 export_ai_jsonl=False, export_site=False, nodes=None, base_url=V2EX_BASE_URL, cache_path=CACHE_PATH, analyzer=None,
+                 archive_path=ARCHIVE_PATH, from_archive=False, keyword_extractor=None, transport=None,
+                 workers=REPLY_FETCH_WORKERS, requests_per_hour=HOURLY_QUOTA, metrics=None, log=None,
+                 progress=None, topic_done=None, is_cancelled=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.export_dir = export_dir
+        self.export_html = export_html
+        self.export_ai_json = export_ai_json
+        self.export_ai_jsonl = export_ai_jsonl
+        # 分片加载的网页目录，适合导出范围很大时浏览
+        self.export_site = export_site
+        # 指定节点时通过帖子列表接口分页回溯，否则只读取RSS feed
+        self.nodes = list(nodes) if nodes else None
+        self.base_url = base_url
+        self.cache_path = cache_path
+        # 导出的帖子写入本地归档；from_archive 时直接从归档导出，不访问网络
+        self.archive_path = archive_path
+        self.from_archive = from_archive
+        self.archive = None
+        # 可传入已配置好的 HttpTransport（如基准测试中关闭限速），由调用方负责关闭
+        self.transport = transport
+        self.owns_transport = transport is None
+        # 并发请求数；每小时请求数（为 0 或 None 时不限速）只用于自行创建的 HttpTransport
+        self.workers = workers
+        self.requests_per_hour = requests_per_hour
+        # 各阶段耗时和计数；多次运行共用同一个 Metrics 时指标会累计
+        self.metrics = metrics or Metrics()
+        self.stage_totals = {}
+        self.analyzer = analyzer or DEFAULT_ANALYZER
+        # 可选的语料级关键词提取（keywords.CorpusKeywordExtractor），导出完成后补充AI JSON中的关键词
+        self.keyword_extractor = keyword_extractor
+        # 日志回调按 log(message, level=logging.INFO) 调用，与 HttpTransport.get 的 log 参数一致
+        self.log = log or (lambda message, level=logging.INFO: print(format_log_line(message), flush=True))
+        self.progress = progress or (lambda done, total: None)
+        # 每处理完一个帖子调用 topic_done(post, error)，error 为评论获取失败的原因
+        self.topic_done = topic_done or (lambda post, error: None)
+        # cancel() 还会唤醒正在等待令牌或重试的请求，不必等到当前帖子处理完
+        self.cancel_event = threading.Event()
+        is_cancelled = is_cancelled or (lambda: False)
+        self.is_cancelled = lambda: self.cancel_event.is_set() or is_cancelled()
+        self.error = None
+
+    def run(self):
+        """执行一次完整的获取和导出，返回处理的帖子数"""
+        cache = None
+        self.archive = None
+        if self.owns_transport:
+            self.transport = None
+        self.stage_totals = {}
+        processed_count = 0
+        start = time.perf_counter()
+        try:
+            # 缓存连接需在运行流水线的线程中创建；目录不可写、数据库被锁定等错误和导出错误一样记录
+            cache = TopicCache(self.cache_path) if self.cache_path else None
+            if self.archive_path:
+                self.archive = self.open_archive()
+            # feed 和所有评论请求共用一个连接池，连接数不少于并发数，否则多出的线程会等待空闲连接
+            if self.owns_transport:
+                rate, burst = quota_rate(self.requests_per_hour)
+                self.transport = HttpTransport(pool_size=max(POOL_SIZE, self.workers), rate=rate, burst=burst,
+                                               metrics=self.metrics, cancel_event=self.cancel_event)
+            processed_count = self.export(cache)
+            return processed_count
+        except RequestCancelled:
+            self.log('任务已取消，未保存文件')
+            return processed_count
+        except Exception as e:
+            self.error = e
+            self.log(f'错误: {str(e)}', logging.ERROR)
+            return 0
+        finally:
+            # 初始化中途失败时，只释放已经创建的资源
+            try:
+                self.record_run(processed_count, time.perf_counter() - start)
+            except OSError as e:
+                self.log(f'写入运行记录失败: {str(e)}', logging.WARNING)
+            if self.transport is not None:
+                self.log_transport_stats()
+                if self.owns_transport:
+                    self.transport.close()
+            if cache is not None:
+                cache.close()
+            if self.archive is not None:
+                self.archive.close()
+                self.archive = None
+
+    def cancel(self):
+        """请求取消任务，可从其他线程调用"""
+        self.cancel_event.set()
+
+    def open_archive(self):
+        """打开本地归档；只是写入归档时，打开失败（目录不可写、SQLite不支持FTS5等）不影响导出"""
+        try:
+            return Archive(self.archive_path)
+        except (OSError, sqlite3.Error) as e:
+            if self.from_archive:
+                raise
+            self.log(f'打开本地归档失败，本次不写入归档: {str(e)}', logging.WARNING)
+            return None
+
+    @contextmanager
+    def stage(self, name):
+        """记录一个阶段的耗时，同时累计到本次运行的 stage_totals"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def record_stage(self, name, elapsed):
+        self.stage_totals[name] = self.stage_totals.get(name, 0.0) + elapsed
+        self.metrics.observe('stage_seconds', elapsed, stage=name)
+
+    def record_run(self, processed_count, duration):
+        """记录本次运行的结果，并向JSON日志写入摘要"""
+        if self.error is not None:
+            result = 'error'
+        elif self.is_cancelled():
+            result = 'cancelled'
+        else:
+            result = 'ok'
+        self.metrics.inc('runs_total', result=result)
+        self.metrics.set('last_run_timestamp_seconds', time.time())
+        self.metrics.set('last_run_duration_seconds', duration)
+        self.metrics.set('last_run_topics', processed_count)
+        self.metrics.event('run_finished', result=result, error=str(self.error) if self.error else None,
+                           start_date=self.start_date, end_date=self.end_date, topics=processed_count,
+                           duration_s=round(duration, 3),
+                           stages_s={name: round(elapsed, 4) for name, elapsed in self.stage_totals.items()},
+                           transport=self.transport.stats.summary() if self.transport is not None else None)
+
+    def log_transport_stats(self):
+        stats = self.transport.stats.summary()
+        if not stats["requests"]:
+            return
+        message = (f'网络请求 {stats["requests"]} 次，重试 {stats["retries"]} 次，失败 {stats["failures"]} 次，'
+                   f'下载 {stats["bytes"] / 1024:.1f} KB，平均延迟 {stats["latency_avg_ms"]} ms，'
+                   f'p95 {stats["latency_p95_ms"]} ms')
+        self.log(message)
+
+    def fetch_feed_content(self, url, cache):
+        """获取feed内容，有缓存时使用条件请求，未修改则直接使用缓存"""
+        headers = {}
+        cached = cache.get_feed(url) if cache is not None else None
+        if cached is not None:
+            etag, last_modified, body = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        
+        response = self.transport.get(url, headers=headers, log=self.log)
+        if response.status_code == 304 and cached is not None:
+            self.log('feed 未更新，使用本地缓存')
+            return cached[2]
+        
+        if cache is not None:
+            cache.put_feed(url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                           response.content)
+        return response.content
+
+    def list_topics(self, cache):
+        """获取日期范围内的帖子列表"""
+        if self.from_archive:
+            self.log('从本地归档读取帖子...')
+            return self.archive.list_topics(self.start_date, self.end_date)
+        
+        if self.nodes:
+            self.log(f'开始获取节点 {", ".join(self.nodes)} 的帖子列表...')
+            lister = TopicLister(self.transport, base_url=self.base_url, nodes=self.nodes, max_workers=self.workers)
+            return lister.list_topics(self.start_date, self.end_date, log=self.log,
+                                      is_cancelled=self.is_cancelled)
+        
+        self.log('开始获取V2EX投资板块的RSS feed...')
+        with self.stage('feed_fetch'):
+            content = self.fetch_feed_content(f'{self.base_url}/feed/invest.xml', cache)
+        with self.stage('feed_parse'):
+            feed = feedparser.parse(content)
+        
+        topics = []
+        for entry in feed.entries:
+            # 解析帖子发布时间
+            published_date = datetime.strptime(entry.published, '%Y-%m-%dT%H:%M:%SZ').date()
+            
+            # 检查日期范围
+            if self.start_date <= published_date <= self.end_date:
+                topics.append(topic_from_feed_entry(entry))
+        return topics
+
+    def fetch_replies(self, topics, cache):
+        """按顺序产出各帖子的评论获取结果，缓存未过期的帖子不再请求网络"""
+        if self.from_archive:
+            for topic in topics:
+                comments = comments_from_replies(self.archive.get_comments(topic["id"]))
+                yield {"topic_id": topic["id"], "comments": comments, "error": None, "messages": []}
+            return
+        
+        fetcher = ReplyFetcher(self.transport, base_url=self.base_url, max_workers=self.workers)
+        topic_ids = [topic["id"] for topic in topics]
+        versions = [topic["version"] for topic in topics]
+        cached = {}
+        if cache is not None:
+            for topic_id, version in zip(topic_ids, versions):
+                comments = cache.get_replies(topic_id, version)
+                if comments is not None:
+                    cached[topic_id] = comments_from_replies(comments)
+        
+        missing = [topic_id for topic_id in topic_ids if topic_id not in cached]
+        if cached:
+            self.log(f'{len(cached)} 个帖子的评论未变化，使用本地缓存')
+            self.metrics.inc('reply_cache_hits_total', len(cached))
+        rate = self.transport.rate
+        if rate and len(missing) > self.transport.burst:
+            minutes = (len(missing) - self.transport.burst) / rate / 60
+            if minutes >= 1:
+                self.log(f'需要获取 {len(missing)} 个帖子的评论，受API请求配额限制约需 {minutes:.0f} 分钟')
+        
+        results = fetcher.fetch_all(missing)
+        try:
+            for topic_id, version in zip(topic_ids, versions):
+                if topic_id in cached:
+                    yield {"topic_id": topic_id, "comments": cached[topic_id], "error": None, "messages": []}
+                    continue
+                
+                with self.stage('reply_wait'):
+                    result = next(results)
+                if cache is not None and result["error"] is None:
+                    cache.put_replies(topic_id, version, [comment.to_reply() for comment in result["comments"]])
+                yield result
+        finally:
+            results.close()
+
+    def base_filename(self):
+        """导出文件名（不含扩展名），由日期范围决定"""
+        return f'v2ex_invest_{self.start_date.strftime("%Y%m%d")}_{self.end_date.strftime("%Y%m%d")}'
+
+    def export(self, cache):
+        """获取帖子和评论并写出导出文件"""
+        # 先取得日期范围内的帖子，再并发获取评论
+        with self.stage('topic_list'):
+            topics = self.list_topics(cache)
+        processed_count = 0
+        
+        base_filename = self.base_filename()
+        
+        # 边处理边写出，内存占用不随帖子数增长
+        writers = []
+        html_writer = None
+        site_writer = None
+        ai_writers = []
+        if self.export_html:
+            html_writer = HtmlExportWriter(os.path.join(self.export_dir, f'{base_filename}.html'))
+            writers.append(html_writer)
+        if self.export_site:
+            site_writer = SiteExportWriter(os.path.join(self.export_dir, f'{base_filename}_site'),
+                                           f'V2EX投资帖子 {self.start_date} 至 {self.end_date}', HTML_STYLES)
+            writers.append(site_writer)
+        if topics and (self.export_ai_json or self.export_ai_jsonl):
+            metadata = self.build_ai_metadata(self.start_date.strftime("%Y-%m-%d"),
+                                              self.end_date.strftime("%Y-%m-%d"), len(topics))
+            if self.export_ai_json:
+                ai_writers.append(AiJsonWriter(os.path.join(self.export_dir, f'{base_filename}_ai.json'), metadata))
+            if self.export_ai_jsonl:
+                ai_writers.append(AiJsonLinesWriter(os.path.join(self.export_dir, f'{base_filename}_ai.jsonl'), metadata))
+            writers.extend(ai_writers)
+        
+        self.progress(0, len(topics))
+        results = self.fetch_replies(topics, cache)
+        try:
+            for topic, result in zip(topics, results):
+                if self.is_cancelled():
+                    break
+                self.export_topic(topic, result, html_writer, ai_writers, site_writer)
+                processed_count += 1
+                self.progress(processed_count, len(topics))
+        except BaseException:
+            # 出错时保留已写出的部分
+            for writer in writers:
+                writer.close()
+            raise
+        finally:
+            results.close()
+        
+        if self.is_cancelled():
+            for writer in writers:
+                writer.discard()
+            self.log('任务已取消，未保存文件')
+            return processed_count
+        
+        for writer in writers:
+            with self.stage('commit'):
+                writer.commit()
+            self.metrics.inc('export_bytes_total', writer.size(), format=writer.format_name)
+            if writer is html_writer:
+                self.log(f'成功保存HTML文件: {writer.path}')
+            elif writer is site_writer:
+                self.log(f'成功保存分片网页: {os.path.join(writer.path, "index.html")}')
+            else:
+                self.log(f'成功保存AI JSON文件: {writer.path}')
+        
+        if self.keyword_extractor is not None and ai_writers and processed_count:
+            with self.stage('keywords'):
+                self.keyword_extractor.enrich_exports([writer.path for writer in ai_writers], self.analyzer)
+            self.log('已根据本次导出的语料补充关键词和标签')
+        
+        if processed_count == 0:
+            self.log('在指定日期范围内没有找到帖子')
+        else:
+            self.log(f'处理完成，共处理 {processed_count} 个帖子')
+        
+        if cache is not None:
+            removed = cache.evict()
+            if removed:
+                self.log(f'已清理 {removed} 条过期缓存')
+        
+        return processed_count
+
+    def export_topic(self, topic, result, html_writer, ai_writers, site_writer=None):
+        """处理单个帖子并写入各导出文件"""
+        start = time.perf_counter()
+        self.log(f'正在处理帖子: {topic["title"]}', logging.DEBUG)
+        
+        # 帖子数据（处理完即写出，不在内存中保留）
+        post = self.build_post(topic, result)
+        
+        for message, level in result["messages"]:
+            self.log(message, level)
+        
+        html_output = self.render_post_html(post, result)
+        if result["error"] is None and post.comments:
+            self.log(f'成功获取 {len(post.comments)} 条评论', logging.DEBUG)
+        
+        self.record_stage('render', time.perf_counter() - start)
+        self.record_topic(post, result)
+        
+        if html_writer is not None:
+            with self.stage('write_html'):
+                html_writer.write_post(html_output)
+        if site_writer is not None:
+            with self.stage('write_site'):
+                site_writer.write_post(post, html_output)
+        # 评论获取失败时不更新归档，以免覆盖已有的评论
+        archive_post = (self.archive is not None and not self.from_archive and result["error"] is None)
+        if ai_writers or archive_post:
+            with self.stage('analysis'):
+                ai_post = self.generate_ai_post(post)
+            for writer in ai_writers:
+                with self.stage(f'write_{writer.format_name}'):
+                    writer.write_post(ai_post)
+            if archive_post:
+                with self.stage('archive'):
+                    self.archive.upsert_post(ai_post)
+
+    def record_topic(self, post, result):
+        self.topic_done(post, result["error"])
+        self.metrics.inc('topics_processed_total')
+        self.metrics.inc('comments_processed_total', len(post.comments))
+        if result["error"] is not None:
+            self.metrics.inc('reply_failures_total')
+            self.metrics.event('reply_failed', topic_id=post.id, error=result["error"])
+
+    def build_post(self, topic, result):
+        return Post(id=topic["id"], title=topic["title"], author=topic["author"], published=topic["published"],
+                    link=topic["link"], summary=topic["summary"], analyzer=self.analyzer,
+                    comments=result["comments"] or [])
+
+    def render_post_html(self, post, result):
+        """生成单个帖子的HTML片段（行列表）"""
+        html_output = []
+        html_output.append('<div class="post">')
+        html_output.append(f'<h2 class="post-title"><a href="{post.link}" target="_blank">{post.title}</a></h2>')
+        html_output.append(f'<div class="post-meta">发布于 {post.published}</div>')
+        html_output.append(f'<div class="post-content">{post.summary}</div>')
+        
+        if result["error"] is not None:
+            html_output.append(f'<div class="comments">获取评论失败: {result["error"]}</div>')
+        elif post.comments:
+            html_output.append('<div class="comments">')
+            html_output.append('<h3>评论区:</h3>')
+            
+            for comment in post.comments:
+                comment_class = 'comment author-comment' if comment.is_author_comment else 'comment'
+                
+                html_output.append(f'<div class="{comment_class}">')
+                html_output.append(f'<div class="comment-floor">#{comment.floor}</div>')
+                # 内容中的@用户名已替换为@楼层号
+                html_output.append(comment.rendered)
+                html_output.append('</div>')
+            
+            html_output.append('</div>')
+        
+        html_output.append('</div>')
+        return html_output
+
+    def build_ai_metadata(self, start, end, total_posts):
+        """生成AI JSON的元数据"""
+        return {
+            "export_date": datetime.now().isoformat(),
+            "source": "V2EX投资板块",
+            "date_range": {
+                "start": start,
+                "end": end
+            },
+            "total_posts": total_posts
+        }
+    
+    def generate_ai_post(self, post):
+        """生成单个帖子的AI JSON数据，post 可以是 Post 对象或帖子字典"""
+        if isinstance(post, Post):
+            return post.to_ai_dict()
+        return analyze_post(post, self.analyzer)
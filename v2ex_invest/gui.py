@@ -0,0 +1,546 @@
+"""V2EX投资帖子阅读器的图形界面"""
+import logging
+import os
+import sys
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from PyQt6.QtWidgets import QApplication, QMainWindow, QPlainTextEdit, QPushButton, QVBoxLayout, QHBoxLayout, QWidget, QLabel, QDateEdit, QLineEdit, QFileDialog, QCheckBox, QComboBox, QGroupBox, QProgressBar, QSpinBox
+from PyQt6.QtCore import QTimer, QDate, QObject, QThread, pyqtSignal
+
+from .core import DEFAULT_NODES, REPLY_FETCH_WORKERS, FeedExporter, TextAnalyzer, format_log_line
+from .incremental import IncrementalExporter
+from .metrics import METRICS_DIR, METRICS_PATH, RUN_LOG_PATH, Metrics
+from .transport import HOURLY_QUOTA
+
+LOG_BATCH_INTERVAL = 0.05    # 后台任务向界面批量发送日志的最小间隔（秒）
+LOG_FLUSH_INTERVAL_MS = 50   # 日志视图合并刷新的间隔（毫秒）
+LOG_MAX_LINES = 5000         # 日志视图最多保留的行数，超出时丢弃最早的
+
+# 日志文件按大小轮转
+LOG_FILE_PATH = os.path.join(METRICS_DIR, 'gui.log')
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+# 日志级别过滤选项：(显示名称, 最低级别)
+LOG_LEVELS = [('全部', logging.DEBUG), ('信息', logging.INFO), ('警告', logging.WARNING), ('错误', logging.ERROR)]
+
+
+class LogView(QPlainTextEdit):
+    """有容量上限的日志视图
+
+    新日志先进入待显示列表，由定时器合并后一次追加；视图和内存中的记录都只保留
+    最近 LOG_MAX_LINES 行，定时刷新连续运行多日也不会越来越慢。可按级别过滤显示，
+    也可以同时写入按大小轮转的日志文件（文件中保留所有级别）。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(LOG_MAX_LINES)
+        self.records = deque(maxlen=LOG_MAX_LINES)   # (级别, 行)，切换过滤级别时用于重建视图
+        self.pending = []
+        self.level = logging.DEBUG
+        self.file_logger = None
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def append_line(self, level, line):
+        self.append_records([(level, line)])
+
+    def append_records(self, records):
+        self.pending.extend(records)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        """把待显示的日志一次性追加到视图"""
+        self.flush_timer.stop()
+        if not self.pending:
+            return
+        records, self.pending = self.pending, []
+        self.records.extend(records)
+        if self.file_logger is not None:
+            for level, line in records:
+                self.file_logger.log(level, line)
+        lines = [line for level, line in records if level >= self.level]
+        if lines:
+            self.appendPlainText('\n'.join(lines[-LOG_MAX_LINES:]))
+
+    def set_level(self, level):
+        """只显示不低于 level 的日志"""
+        self.flush()
+        self.level = level
+        self.setPlainText('\n'.join(line for record_level, line in self.records if record_level >= level))
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+
+    def set_log_file(self, path):
+        """开始写入日志文件，path 为 None 时停止；无法打开文件时抛出 OSError"""
+        self.flush()
+        if self.file_logger is not None:
+            for handler in list(self.file_logger.handlers):
+                self.file_logger.removeHandler(handler)
+                handler.close()
+            self.file_logger = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS,
+                                          encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+            self.file_logger = logging.getLogger(__name__)
+            self.file_logger.setLevel(logging.DEBUG)
+            self.file_logger.propagate = False
+            self.file_logger.addHandler(handler)
+
+    def clear_records(self):
+        self.flush()
+        self.records.clear()
+        self.clear()
+
+
+class FetchWorker(QObject):
+    """在后台线程中运行 FeedExporter，通过信号批量回传日志和进度，逐个回传帖子的处理结果"""
+    log_batch = pyqtSignal(list)
+    progress = pyqtSignal(int, int)
+    topic_done = pyqtSignal(str, str, int, str)    # 帖子ID、标题、评论数、失败原因（成功时为空）
+    finished = pyqtSignal(int)
+
+    def __init__(self, export_options):
+        super().__init__()
+        self.export_options = export_options
+        self.cancelled = False
+        self.exporter = None
+        self.pending_logs = []
+        self.last_flush = 0.0
+
+    def run(self):
+        options = dict(self.export_options)
+        exporter_class = IncrementalExporter if options.pop("incremental", False) else FeedExporter
+        processed_count = 0
+        try:
+            self.exporter = exporter_class(**options, log=self.queue_log,
+                                           progress=self.report_progress,
+                                           topic_done=self.report_topic,
+                                           is_cancelled=lambda: self.cancelled)
+            processed_count = self.exporter.run()
+        except Exception as e:
+            # 槽函数中未捕获的异常会让 PyQt6 直接终止进程
+            self.queue_log(f'错误: {str(e)}', logging.ERROR)
+        finally:
+            self.flush_logs()
+            self.finished.emit(processed_count)
+
+    def cancel(self):
+        """请求取消任务；可在界面线程中调用，正在等待限速或重试的请求会立即结束"""
+        self.cancelled = True
+        exporter = self.exporter
+        if exporter is not None:
+            exporter.cancel()
+
+    def queue_log(self, message, level=logging.INFO):
+        self.pending_logs.append((level, format_log_line(message)))
+        if time.monotonic() - self.last_flush >= LOG_BATCH_INTERVAL:
+            self.flush_logs()
+
+    def report_progress(self, done, total):
+        self.flush_logs()
+        self.progress.emit(done, total)
+
+    def report_topic(self, post, error):
+        self.topic_done.emit(post.id, post.title, len(post.comments), error or '')
+
+    def flush_logs(self):
+        """把积攒的日志一次性发送给界面"""
+        self.last_flush = time.monotonic()
+        if self.pending_logs:
+            self.log_batch.emit(self.pending_logs)
+            self.pending_logs = []
+
+
+class V2EXInvestReader(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.worker_thread = None
+        self.worker = None
+        # 定时刷新时在多次运行间累计指标，每次运行后写出textfile供监控采集；
+        # JSON运行记录不轮转，勾选“保存运行记录”后才写入
+        self.metrics = Metrics()
+        self.initUI()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.fetch_feed)
+        
+        # 添加日期选择器的信号连接
+        self.start_date.dateChanged.connect(self.validate_date_range)
+        self.end_date.dateChanged.connect(self.validate_date_range)
+        
+    def initUI(self):
+        self.setWindowTitle('V2EX投资帖子阅读器')
+        self.setGeometry(100, 100, 900, 700)
+        
+        # 创建中央部件和布局
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+        
+        # 创建设置区域
+        settings_group = QGroupBox('导出设置')
+        settings_layout = QVBoxLayout(settings_group)
+        
+        # 日期范围选择区域
+        date_layout = QHBoxLayout()
+        date_range_label = QLabel('日期范围：')
+        self.start_date = QDateEdit()
+        self.start_date.setDate(QDate.currentDate().addDays(-7))  # 默认7天前
+        self.start_date.setCalendarPopup(True)
+        self.start_date.setDisplayFormat('yyyy-MM-dd')
+        
+        self.end_date = QDateEdit()
+        self.end_date.setDate(QDate.currentDate())
+        self.end_date.setCalendarPopup(True)
+        self.end_date.setDisplayFormat('yyyy-MM-dd')
+        
+        date_layout.addWidget(date_range_label)
+        date_layout.addWidget(self.start_date)
+        date_layout.addWidget(QLabel('至'))
+        date_layout.addWidget(self.end_date)
+        date_layout.addStretch()
+        
+        # 快捷选项按钮
+        quick_select_layout = QHBoxLayout()
+        last_7_days = QPushButton('最近7天')
+        last_30_days = QPushButton('最近30天')
+        last_90_days = QPushButton('最近90天')
+        
+        last_7_days.clicked.connect(lambda: self.set_date_range(7))
+        last_30_days.clicked.connect(lambda: self.set_date_range(30))
+        last_90_days.clicked.connect(lambda: self.set_date_range(90))
+        
+        quick_select_layout.addWidget(last_7_days)
+        quick_select_layout.addWidget(last_30_days)
+        quick_select_layout.addWidget(last_90_days)
+        quick_select_layout.addStretch()
+        
+        # 设置按钮样式
+        button_style = "QPushButton { padding: 5px 10px; border-radius: 3px; background-color: #f0f0f0; } QPushButton:hover { background-color: #e0e0e0; }"
+        last_7_days.setStyleSheet(button_style)
+        last_30_days.setStyleSheet(button_style)
+        last_90_days.setStyleSheet(button_style)
+        
+        # 导出目录设置
+        export_dir_layout = QHBoxLayout()
+        export_dir_label = QLabel('导出目录：')
+        self.export_dir_input = QLineEdit()
+        self.export_dir_input.setPlaceholderText('默认为当前目录')
+        self.export_dir_input.setText(os.getcwd())  # 默认当前目录
+        
+        browse_button = QPushButton('浏览...')
+        browse_button.clicked.connect(self.browse_export_dir)
+        browse_button.setStyleSheet(button_style)
+        
+        export_dir_layout.addWidget(export_dir_label)
+        export_dir_layout.addWidget(self.export_dir_input)
+        export_dir_layout.addWidget(browse_button)
+        
+        # 词典设置，留空时使用内置词典
+        dictionary_layout = QHBoxLayout()
+        self.dictionary_input = QLineEdit()
+        self.dictionary_input.setPlaceholderText('词典JSON文件（key_point_words、positive_words 等），留空使用内置词典')
+        
+        dictionary_button = QPushButton('浏览...')
+        dictionary_button.clicked.connect(self.browse_dictionary)
+        dictionary_button.setStyleSheet(button_style)
+        
+        dictionary_layout.addWidget(QLabel('词典：'))
+        dictionary_layout.addWidget(self.dictionary_input)
+        dictionary_layout.addWidget(dictionary_button)
+        
+        # 导出格式选项
+        export_format_layout = QHBoxLayout()
+        export_format_label = QLabel('导出格式：')
+        self.html_checkbox = QCheckBox('HTML格式')
+        self.html_checkbox.setChecked(True)
+        self.ai_json_checkbox = QCheckBox('AI阅读JSON格式')
+        self.ai_json_checkbox.setChecked(True)
+        self.ai_jsonl_checkbox = QCheckBox('AI阅读JSON Lines格式')
+        self.ai_jsonl_checkbox.setChecked(False)
+        self.site_checkbox = QCheckBox('分片网页')
+        self.site_checkbox.setChecked(False)
+        
+        export_format_layout.addWidget(export_format_label)
+        export_format_layout.addWidget(self.html_checkbox)
+        export_format_layout.addWidget(self.ai_json_checkbox)
+        export_format_layout.addWidget(self.ai_jsonl_checkbox)
+        export_format_layout.addWidget(self.site_checkbox)
+        export_format_layout.addStretch()
+        
+        # 增量导出：只追加新帖子和新楼层，定期合并为完整快照
+        self.incremental_checkbox = QCheckBox('增量导出')
+        self.incremental_checkbox.setChecked(False)
+        export_format_layout.addWidget(self.incremental_checkbox)
+        
+        # 节点设置，留空时只读取RSS feed
+        nodes_layout = QHBoxLayout()
+        nodes_label = QLabel('节点：')
+        self.nodes_input = QLineEdit()
+        self.nodes_input.setPlaceholderText('多个节点用空格或逗号分隔，留空则只读取RSS feed')
+        self.nodes_input.setText(' '.join(DEFAULT_NODES))
+        
+        nodes_layout.addWidget(nodes_label)
+        nodes_layout.addWidget(self.nodes_input)
+        
+        # 并发数和每小时请求数，默认按V2EX API每个IP的配额限速
+        self.workers_input = QSpinBox()
+        self.workers_input.setRange(1, 16)
+        self.workers_input.setValue(REPLY_FETCH_WORKERS)
+        self.rate_input = QSpinBox()
+        self.rate_input.setRange(0, 3600)
+        self.rate_input.setValue(HOURLY_QUOTA)
+        self.rate_input.setSpecialValueText('不限速')
+        self.rate_input.setSuffix(' 次/小时')
+        nodes_layout.addWidget(QLabel('并发数：'))
+        nodes_layout.addWidget(self.workers_input)
+        nodes_layout.addWidget(QLabel('请求限速：'))
+        nodes_layout.addWidget(self.rate_input)
+        
+        settings_layout.addLayout(date_layout)
+        settings_layout.addLayout(quick_select_layout)
+        settings_layout.addLayout(nodes_layout)
+        settings_layout.addLayout(export_dir_layout)
+        settings_layout.addLayout(dictionary_layout)
+        settings_layout.addLayout(export_format_layout)
+        
+        layout.addWidget(settings_group)
+        
+        # 创建日志显示区域
+        self.log_area = LogView()
+        layout.addWidget(self.log_area)
+        
+        # 创建进度条
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+        
+        # 创建按钮
+        button_layout = QHBoxLayout()
+        self.fetch_button = QPushButton('获取并导出帖子')
+        self.fetch_button.clicked.connect(self.fetch_feed)
+        self.fetch_button.setStyleSheet("QPushButton { padding: 10px; background-color: #007bff; color: white; border-radius: 5px; font-weight: bold; } QPushButton:hover { background-color: #0056b3; }")
+        
+        self.cancel_button = QPushButton('取消')
+        self.cancel_button.clicked.connect(self.cancel_fetch)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setStyleSheet(button_style)
+        
+        self.clear_log_button = QPushButton('清空日志')
+        self.clear_log_button.clicked.connect(self.clear_log)
+        self.clear_log_button.setStyleSheet(button_style)
+        
+        button_layout.addWidget(self.fetch_button)
+        button_layout.addWidget(self.cancel_button)
+        button_layout.addWidget(self.clear_log_button)
+        button_layout.addStretch()
+        
+        # 日志级别过滤和日志文件
+        self.log_level_combo = QComboBox()
+        for name, level in LOG_LEVELS:
+            self.log_level_combo.addItem(name, level)
+        self.log_level_combo.currentIndexChanged.connect(
+            lambda index: self.log_area.set_level(self.log_level_combo.itemData(index)))
+        self.log_file_checkbox = QCheckBox('保存日志到文件')
+        self.log_file_checkbox.setToolTip(LOG_FILE_PATH)
+        self.log_file_checkbox.toggled.connect(self.toggle_log_file)
+        self.run_log_checkbox = QCheckBox('保存运行记录')
+        self.run_log_checkbox.setToolTip(RUN_LOG_PATH)
+        self.run_log_checkbox.toggled.connect(self.toggle_run_log)
+        
+        button_layout.addWidget(QLabel('日志级别：'))
+        button_layout.addWidget(self.log_level_combo)
+        button_layout.addWidget(self.log_file_checkbox)
+        button_layout.addWidget(self.run_log_checkbox)
+        
+        layout.addLayout(button_layout)
+        
+    def log(self, message, level=logging.INFO):
+        self.log_area.append_line(level, format_log_line(message))
+    
+    def append_log_lines(self, records):
+        """追加后台任务批量发送的日志"""
+        self.log_area.append_records(records)
+    
+    def toggle_log_file(self, checked):
+        try:
+            self.log_area.set_log_file(LOG_FILE_PATH if checked else None)
+        except OSError as e:
+            self.log(f'打开日志文件失败: {str(e)}', logging.WARNING)
+            self.log_file_checkbox.setChecked(False)
+        
+    def toggle_run_log(self, checked):
+        """开关每次运行摘要、重试和失败事件的JSON Lines记录"""
+        self.metrics.json_log_path = RUN_LOG_PATH if checked else None
+        
+    def fetch_feed(self):
+        # 上一次任务仍在运行时不再叠加新的任务（定时器触发时尤其如此）
+        if self.worker_thread is not None:
+            self.log('上一次获取仍在进行中，跳过本次请求')
+            return
+        
+        # 获取用户设置的参数
+        start_date = self.start_date.date().toPyDate()
+        end_date = self.end_date.date().toPyDate()
+        export_dir = self.export_dir_input.text().strip()
+        
+        # 检查导出目录是否存在
+        if not export_dir:
+            export_dir = os.getcwd()
+        elif not os.path.exists(export_dir):
+            self.log(f'导出目录不存在: {export_dir}，将使用当前目录', logging.WARNING)
+            export_dir = os.getcwd()
+        
+        # 检查导出格式选项
+        export_html = self.html_checkbox.isChecked()
+        export_ai_json = self.ai_json_checkbox.isChecked()
+        export_ai_jsonl = self.ai_jsonl_checkbox.isChecked()
+        export_site = self.site_checkbox.isChecked()
+        
+        if not export_html and not export_ai_json and not export_ai_jsonl and not export_site:
+            self.log('错误: 请至少选择一种导出格式', logging.ERROR)
+            return
+        if self.incremental_checkbox.isChecked() and not export_html and not export_ai_json and not export_ai_jsonl:
+            self.log('错误: 增量导出不支持分片网页格式，请同时选择其他导出格式', logging.ERROR)
+            return
+        
+        dictionary_path = self.dictionary_input.text().strip()
+        analyzer = None
+        if dictionary_path:
+            try:
+                analyzer = TextAnalyzer.from_file(dictionary_path)
+            except (OSError, ValueError) as e:
+                self.log(f'错误: 读取词典失败: {str(e)}', logging.ERROR)
+                return
+        
+        self.log(f'设置参数：日期范围：{start_date} 至 {end_date}')
+        nodes = self.nodes_input.text().replace(',', ' ').split()
+        self.log(f'数据来源：{"节点 " + ", ".join(nodes) if nodes else "RSS feed"}')
+        self.log(f'导出目录：{export_dir}')
+        if dictionary_path:
+            self.log(f'词典：{dictionary_path}')
+        self.log(f'导出格式：HTML={export_html}, AI JSON={export_ai_json}, AI JSON Lines={export_ai_jsonl}, '
+                 f'分片网页={export_site}')
+        
+        export_options = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "export_dir": export_dir,
+            "export_html": export_html,
+            "export_ai_json": export_ai_json,
+            "export_ai_jsonl": export_ai_jsonl,
+            "export_site": export_site,
+            "nodes": nodes,
+            "analyzer": analyzer,
+            "workers": self.workers_input.value(),
+            "requests_per_hour": self.rate_input.value(),
+            "incremental": self.incremental_checkbox.isChecked(),
+            "metrics": self.metrics
+        }
+        
+        # 在后台线程中运行，避免阻塞界面
+        self.worker_thread = QThread()
+        self.worker = FetchWorker(export_options)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.started.connect(self.worker.run)
+        self.worker.log_batch.connect(self.append_log_lines)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.topic_done.connect(self.on_topic_done)
+        self.worker.finished.connect(self.on_fetch_finished)
+        self.worker.finished.connect(self.worker_thread.quit)
+        self.worker_thread.finished.connect(self.on_thread_finished)
+        
+        self.fetch_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.progress_bar.setValue(0)
+        self.worker_thread.start()
+    
+    def cancel_fetch(self):
+        """取消正在运行的获取任务"""
+        if self.worker is not None:
+            self.worker.cancel()
+            self.cancel_button.setEnabled(False)
+            self.log('正在取消任务...')
+    
+    def update_progress(self, done, total):
+        self.progress_bar.setMaximum(max(total, 1))
+        self.progress_bar.setValue(done)
+    
+    def on_topic_done(self, topic_id, title, comment_count, error):
+        """在状态栏显示刚处理完的帖子"""
+        if error:
+            self.statusBar().showMessage(f'{title}：获取评论失败（{error}）')
+        else:
+            self.statusBar().showMessage(f'{title}：{comment_count} 条评论')
+
+    def on_fetch_finished(self, processed_count):
+        self.fetch_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        try:
+            self.metrics.write_textfile(METRICS_PATH)
+        except OSError as e:
+            self.log(f'写出运行指标失败: {str(e)}', logging.WARNING)
+        self.log_area.flush()
+    
+    def on_thread_finished(self):
+        # 线程真正退出后才释放引用，避免销毁仍在运行的 QThread
+        self.worker_thread.deleteLater()
+        self.worker.deleteLater()
+        self.worker_thread = None
+        self.worker = None
+    
+    def closeEvent(self, event):
+        """关闭窗口时取消后台任务并等待线程退出"""
+        if self.worker_thread is not None:
+            self.worker.cancel()
+            self.worker_thread.wait()
+        self.log_area.set_log_file(None)
+        super().closeEvent(event)
+
+    def set_date_range(self, days):
+        """设置日期范围的快捷方法"""
+        end_date = QDate.currentDate()
+        start_date = end_date.addDays(-days + 1)  # +1 是为了包含今天
+        self.start_date.setDate(start_date)
+        self.end_date.setDate(end_date)
+    
+    def browse_export_dir(self):
+        """浏览选择导出目录"""
+        directory = QFileDialog.getExistingDirectory(self, '选择导出目录', self.export_dir_input.text())
+        if directory:
+            self.export_dir_input.setText(directory)
+    
+    def browse_dictionary(self):
+        """浏览选择词典文件"""
+        path, _ = QFileDialog.getOpenFileName(self, '选择词典文件', self.dictionary_input.text(), 'JSON文件 (*.json)')
+        if path:
+            self.dictionary_input.setText(path)
+    
+    def clear_log(self):
+        """清空日志区域"""
+        self.log_area.clear_records()
+    
+    def validate_date_range(self):
+        """验证并确保开始日期不晚于结束日期"""
+        start = self.start_date.date()
+        end = self.end_date.date()
+        
+        if start > end:
+            # 如果开始日期晚于结束日期，将结束日期设置为开始日期
+            self.end_date.setDate(start)
+
+def main():
+    app = QApplication(sys.argv)
+    reader = V2EXInvestReader()
+    reader.show()
+    sys.exit(app.exec())
@@ -0,0 +1,327 @@
+"""增量导出：只追加新帖子和新楼层，不再每次重写整个导出文件
+
+每个导出文件旁边保存一个状态库 <文件名>_state.sqlite3，记录各帖子的版本标记、
+水位（已导出的最大楼层）和渲染好的HTML片段。文件名通常由日期范围决定；按
+“最近N天”滚动导出时（window_days）由来源和天数决定，如
+v2ex_invest_invest_last7d，日期前移后仍使用同一组文件，移出范围的帖子从
+状态库和快照中删除。每次运行：
+
+- 版本标记没变的帖子没有新回复，不请求评论、不重新渲染；
+- 新帖子和已有帖子的新楼层以 JSON Lines 追加到增量日志 <文件名>_ai_delta.jsonl，
+  每行一条记录：{"op": "post", "post": {...}} 或
+  {"op": "comments", "topic_id": ..., "comments": [...]}；
+- HTML 由状态库中的片段直接拼接，只有变化的帖子重新渲染；
+- 每隔 COMPACT_EVERY_RUNS 次运行（或快照缺失时）把增量日志合并进
+  _ai.json / _ai.jsonl 快照并清空增量日志。
+
+合并按楼层去重，增量日志写入后、状态更新前中断导致的重复记录不影响结果。
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from .core import AiJsonLinesWriter, AiJsonWriter, FeedExporter, HtmlExportWriter
+from .reanalyze import load_export
+
+COMPACT_EVERY_RUNS = 24      # 每隔多少次运行合并一次增量日志
+STATE_SUFFIX = '_state.sqlite3'
+DELTA_SUFFIX = '_ai_delta.jsonl'
+
+
+class IncrementalState:
+    """一个导出文件的增量状态"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS topics (
+                topic_id TEXT PRIMARY KEY,
+                published TEXT,
+                version TEXT,
+                watermark INTEGER,
+                html TEXT
+            )''')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def close(self):
+        self.conn.close()
+
+    def topics(self):
+        """返回 {帖子ID: (版本标记, 水位)}"""
+        return {row[0]: (row[1], row[2])
+                for row in self.conn.execute('SELECT topic_id, version, watermark FROM topics')}
+
+    def put_topic(self, topic_id, published, version, watermark, html):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO topics VALUES (?, ?, ?, ?, ?)',
+                              (topic_id, published, version, watermark, html))
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('html_dirty', '1')")
+
+    def fragments(self):
+        """按发布时间倒序产出各帖子的HTML片段"""
+        for (html,) in self.conn.execute('SELECT html FROM topics ORDER BY published DESC, rowid'):
+            yield html
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, str(value)))
+
+    def prune(self, before):
+        """删除发布时间早于 before（ISO格式的日期）的帖子，返回删除的条数"""
+        with self.conn:
+            removed = self.conn.execute('DELETE FROM topics WHERE published < ?', (before,)).rowcount
+            if removed:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('html_dirty', '1')")
+        return removed
+
+    def reset(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM topics')
+            self.conn.execute('DELETE FROM meta')
+
+
+def merge_record(posts, record):
+    """把一条增量记录合并到 {帖子ID: 帖子} 中，已有的楼层会被忽略"""
+    if record["op"] == "post":
+        post = record["post"]
+        target = posts.get(str(post["id"]))
+        if target is None:
+            posts[str(post["id"])] = post
+            return
+        comments = post["comments"]
+    else:
+        target = posts.get(str(record["topic_id"]))
+        if target is None:
+            return
+        comments = record["comments"]
+    last_floor = target["comments"][-1]["floor"] if target["comments"] else 0
+    target["comments"].extend(comment for comment in comments if comment["floor"] > last_floor)
+
+
+class IncrementalExporter(FeedExporter):
+    """增量导出的流水线，参数与 FeedExporter 相同
+
+    compact_every 为合并增量日志的运行间隔，force_compact 时本次运行结束后立即合并。
+    日期范围为相对今天的最近 window_days 天时传入 window_days，各次运行共用同一组文件。
+    """
+
+    def __init__(self, *args, compact_every=COMPACT_EVERY_RUNS, force_compact=False, window_days=None,
+                 **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compact_every = compact_every
+        self.force_compact = force_compact
+        self.window_days = window_days
+
+    def base_filename(self):
+        """滚动导出时文件名由来源和天数决定，不随日期变化"""
+        if self.window_days is None:
+            return super().base_filename()
+        if self.from_archive:
+            source = 'archive'
+        else:
+            source = '_'.join(self.nodes) if self.nodes else 'feed'
+        return f'v2ex_invest_{source}_last{self.window_days}d'
+
+    def export(self, cache):
+        with self.stage('topic_list'):
+            topics = self.list_topics(cache)
+
+        base_path = os.path.join(self.export_dir, self.base_filename())
+        state = IncrementalState(base_path + STATE_SUFFIX)
+        try:
+            return self.export_changes(topics, cache, state, base_path)
+        finally:
+            state.close()
+
+    def export_changes(self, topics, cache, state, base_path):
+        html_path = base_path + '.html'
+        delta_path = base_path + DELTA_SUFFIX
+        snapshot_paths = []
+        if self.export_ai_json:
+            snapshot_paths.append(base_path + '_ai.json')
+        if self.export_ai_jsonl:
+            snapshot_paths.append(base_path + '_ai.jsonl')
+
+        if self.export_site:
+            self.log('增量导出不支持分片网页格式，已跳过', logging.WARNING)
+
+        # 滚动导出时移出日期范围的帖子不再保留，快照随后立即合并
+        pruned = state.prune(self.start_date.isoformat())
+        if pruned:
+            self.log(f'{pruned} 个帖子已移出日期范围')
+        known = state.topics()
+        # 快照被删除后增量日志不足以恢复完整数据，重新完整导出
+        if snapshot_paths and known and not any(os.path.exists(path) for path in snapshot_paths):
+            self.log('未找到已有的AI JSON快照，重新完整导出')
+            state.reset()
+            known = {}
+            if os.path.exists(delta_path):
+                os.remove(delta_path)
+
+        # 版本标记没变的帖子没有新回复；获取失败过的帖子版本为空，需要重试
+        changed = []
+        for topic in topics:
+            entry = known.get(topic["id"])
+            if entry is None or entry[0] is None or entry[0] != topic["version"]:
+                changed.append(topic)
+        if topics:
+            self.log(f'{len(topics) - len(changed)} 个帖子没有新回复，{len(changed)} 个帖子需要更新')
+
+        processed_count = 0
+        run_id = datetime.now().isoformat()
+        delta = open(delta_path, 'a', encoding='utf-8') if snapshot_paths and changed else None
+        self.progress(0, len(changed))
+        results = self.fetch_replies(changed, cache)
+        try:
+            for topic, result in zip(changed, results):
+                if self.is_cancelled():
+                    break
+                self.export_topic_delta(topic, result, known.get(topic["id"]), state, delta, run_id)
+                processed_count += 1
+                self.progress(processed_count, len(changed))
+        finally:
+            results.close()
+            if delta is not None:
+                delta.close()
+
+        if self.is_cancelled():
+            # 已处理的帖子都已写入增量日志和状态库，下次运行时重建HTML
+            self.log('任务已取消，已处理的帖子保存在增量日志中')
+            return processed_count
+
+        if self.export_html and (state.get_meta('html_dirty') == '1' or not os.path.exists(html_path)):
+            self.rebuild_html(state, html_path)
+
+        if snapshot_paths:
+            runs = int(state.get_meta('runs_since_compaction', '0')) + 1
+            if (self.force_compact or pruned or runs >= self.compact_every
+                    or not all(os.path.exists(path) for path in snapshot_paths)):
+                with self.stage('compact'):
+                    total = self.compact(snapshot_paths, delta_path)
+                self.log(f'已合并增量日志，快照共 {total} 个帖子')
+                runs = 0
+            state.set_meta('runs_since_compaction', runs)
+
+        if not topics:
+            self.log('在指定日期范围内没有找到帖子')
+        else:
+            self.log(f'处理完成，{processed_count} 个帖子有更新')
+
+        if cache is not None:
+            removed = cache.evict()
+            if removed:
+                self.log(f'已清理 {removed} 条过期缓存')
+
+        return processed_count
+
+    def export_topic_delta(self, topic, result, entry, state, delta, run_id):
+        """处理一个有变化的帖子：重新渲染HTML片段，把新楼层追加到增量日志"""
+        start = time.perf_counter()
+        self.log(f'正在处理帖子: {topic["title"]}', logging.DEBUG)
+        post = self.build_post(topic, result)
+        for message, level in result["messages"]:
+            self.log(message, level)
+
+        is_new = entry is None
+        if result["error"] is not None and not is_new:
+            # 获取失败时保留上次的片段和水位，下次运行时重试
+            self.record_topic(post, result)
+            return
+
+        html = '\n'.join(self.render_post_html(post, result))
+        self.record_stage('render', time.perf_counter() - start)
+        self.record_topic(post, result)
+
+        watermark = 0 if is_new else entry[1]
+        new_comments = post.comments[watermark:]
+        if delta is not None and (is_new or new_comments):
+            with self.stage('analysis'):
+                if is_new:
+                    record = {"op": "post", "run": run_id, "post": post.to_ai_dict()}
+                else:
+                    record = {"op": "comments", "run": run_id, "topic_id": post.id,
+                              "comments": [comment.to_ai_dict(self.analyzer) for comment in new_comments]}
+            with self.stage('write_delta'):
+                delta.write(json.dumps(record, ensure_ascii=False) + '\n')
+                delta.flush()
+        if result["error"] is None:
+            self.log(f'成功获取 {len(post.comments)} 条评论，新增 {len(new_comments)} 条', logging.DEBUG)
+            if self.archive is not None and not self.from_archive:
+                with self.stage('archive'):
+                    self.archive.upsert_post(self.generate_ai_post(post))
+
+        version = topic["version"] if result["error"] is None else None
+        state.put_topic(topic["id"], topic["published"], version, max(watermark, len(post.comments)), html)
+
+    def rebuild_html(self, state, html_path):
+        """用状态库中的片段拼出完整的HTML文件"""
+        writer = HtmlExportWriter(html_path)
+        try:
+            with self.stage('write_html'):
+                for fragment in state.fragments():
+                    writer.write_post([fragment])
+            with self.stage('commit'):
+                writer.commit()
+        except BaseException:
+            writer.discard()
+            raise
+        state.set_meta('html_dirty', '0')
+        self.metrics.inc('export_bytes_total', os.path.getsize(html_path), format=writer.format_name)
+        self.log(f'成功保存HTML文件: {html_path}')
+
+    def compact(self, snapshot_paths, delta_path):
+        """把增量日志合并进快照，写出所有启用格式的快照后删除增量日志，返回帖子数"""
+        posts = {}
+        source = next((path for path in snapshot_paths if os.path.exists(path)), None)
+        if source is not None:
+            _, loaded = load_export(source)
+            posts = {str(post["id"]): post for post in loaded}
+
+        if os.path.exists(delta_path):
+            with open(delta_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 只有中断时未写完的最后一行会出现这种情况
+                        self.log(f'跳过增量日志中不完整的记录: {line[:80]}', logging.WARNING)
+                        continue
+                    merge_record(posts, record)
+
+        start = self.start_date.isoformat()
+        ordered = sorted((post for post in posts.values() if post["published"] >= start),
+                         key=lambda post: post["published"], reverse=True)
+        metadata = self.build_ai_metadata(self.start_date.strftime("%Y-%m-%d"),
+                                          self.end_date.strftime("%Y-%m-%d"), len(ordered))
+        writers = [AiJsonLinesWriter(path, metadata) if path.endswith('.jsonl') else AiJsonWriter(path, metadata)
+                   for path in snapshot_paths]
+        try:
+            for post in ordered:
+                for writer in writers:
+                    writer.write_post(post)
+            for writer in writers:
+                writer.commit()
+        except BaseException:
+            for writer in writers:
+                writer.discard()
+            raise
+
+        if self.keyword_extractor is not None and ordered:
+            with self.stage('keywords'):
+                self.keyword_extractor.enrich_exports(snapshot_paths, self.analyzer)
+        for writer in writers:
+            self.metrics.inc('export_bytes_total', os.path.getsize(writer.path), format=writer.format_name)
+            self.log(f'成功保存AI JSON文件: {writer.path}')
+        # 快照替换完成后才删除增量日志；两步之间中断时，重复的楼层会在下次合并时被忽略
+        if os.path.exists(delta_path):
+            os.remove(delta_path)
+        return len(ordered)
@@ -0,0 +1,425 @@
+"""基于整次导出语料的 TF-IDF 关键词提取
+
+词典分析只认识预先列出的词，没有命中预定义标签时按空格切分的后备标签对
+不分词的中文几乎无效。这里把一次导出中的所有帖子正文和评论作为语料：
+
+- 分词由可替换的分词器完成：默认的 NgramSegmenter 用 NumPy 在整个语料拼接成的
+  码点数组上一次性生成二到四字的汉字 n 元组（跳过常见虚词），只保留不总是出现在
+  更长片段中的完整 n 元组，英文/数字按词切分；安装了 jieba 时可以改用 JiebaSegmenter；
+- 词频矩阵用 scipy.sparse 一次构建，TF-IDF 权重、每个文档得分最高的词以及去掉
+  被同一文档中更长的词包含的片段，都在稀疏矩阵上批量计算；
+- 文档频率保存在 ~/.v2ex_invest/keywords.sqlite3 中，按文档（帖子ID和楼层）去重
+  后跨运行累计，语料越多 IDF 越准确。
+
+结果写回AI JSON已有的字段：帖子没有命中预定义标签时 tags 取得分最高的词；
+key_points 在词典命中的关键词之后用得分最高的词补足。需要 numpy 和 scipy。
+"""
+import os
+import re
+import sqlite3
+
+import numpy as np
+from scipy import sparse
+
+from .archive import TAG_PATTERN
+from .core import MAX_FALLBACK_TAGS, MAX_KEY_POINTS
+from .reanalyze import load_export, save_export
+
+KEYWORDS_PATH = os.path.join(os.path.expanduser('~'), '.v2ex_invest', 'keywords.sqlite3')
+MIN_DOCUMENT_FREQUENCY = 2   # 只在一个文档中出现过的词多为切分碎片，不作为关键词
+CANDIDATE_FACTOR = 3         # 每个文档先取 top_k 的几倍候选词，再去掉被更长的候选词包含的词
+
+# 常见虚词，包含它们的二元组/三元组不作为候选词
+STOP_CHARS = '的了是在我你他她它这那有和就都也不吗呢吧啊么个们与及或而但之其被把让给着过很又还'
+CJK_RANGES = [(0x3400, 0x4DBF), (0x4E00, 0x9FFF), (0xF900, 0xFAFF)]
+ASCII_WORD_PATTERN = re.compile(r'[A-Za-z0-9]{2,}')
+# @用户名 和 @#楼层号；帖子正文是渲染后的HTML，去掉标签后 @ 和用户名之间可能有空白
+MENTION_TEXT_PATTERN = re.compile(r'@\s*(?:#\d+|[A-Za-z0-9_-]+)')
+CODE_BITS = 21               # Unicode 码点的位数
+MAX_NGRAM_LENGTH = 4         # 汉字 n 元组的最大长度
+SUBSUMED_RATIO = 0.9         # 更长的 n 元组的文档频率不低于该比例时，较短的视为它的片段
+
+
+def doc_key(post_id, floor):
+    """帖子正文的楼层为 0"""
+    return f'{post_id}#{floor}'
+
+
+def document_text(text):
+    """去掉HTML标签和@提及，用户名不作为关键词"""
+    return MENTION_TEXT_PATTERN.sub(' ', TAG_PATTERN.sub(' ', text or ''))
+
+
+def dictionary_overlaps(words, word_bits):
+    """返回 {词: 位掩码}，标出每个词包含或属于 word_bits 中的哪些词典词"""
+    words = sorted(words)
+    masks = np.zeros(len(words), dtype=object)
+    if words:
+        array = np.array(words)
+        for dictionary_word, bit in word_bits.items():
+            inner = [dictionary_word[i:j] for i in range(len(dictionary_word))
+                     for j in range(i + 1, len(dictionary_word) + 1)]
+            overlapping = (np.strings.find(array, dictionary_word) >= 0) | np.isin(array, inner)
+            masks[overlapping] |= bit
+    return {word: mask for word, mask in zip(words, masks.tolist()) if mask}
+
+
+def factorize(doc_terms):
+    """把 (文档序号, 词) 列表转换为 (文档序号数组, 词序号数组, 词表)"""
+    vocabulary = {}
+    doc_index = np.fromiter((doc for doc, _ in doc_terms), dtype=np.int64, count=len(doc_terms))
+    term_index = np.fromiter((vocabulary.setdefault(term, len(vocabulary)) for _, term in doc_terms),
+                             dtype=np.int64, count=len(doc_terms))
+    return doc_index, term_index, list(vocabulary)
+
+
+class NgramSegmenter:
+    """汉字 n 元组加英文/数字词的分词器，不依赖词典"""
+
+    def __init__(self, max_length=MAX_NGRAM_LENGTH):
+        self.max_length = max_length
+        # 最长长度不同时词表不同，累计的文档频率分开保存
+        self.name = f'ngram{max_length}'
+        self.stop_codes = np.array([ord(ch) for ch in STOP_CHARS], dtype=np.int64)
+
+    def segment(self, texts):
+        """返回 (文档序号数组, 词序号数组, 词表)，同一文档中重复出现的词各占一项
+
+        n 元组逐级生成：每个 n 元组由 (n-1 元组的编号, 最后一个字) 唯一确定，每级只需
+        对一个整数数组做一次 np.unique，长度不受64位整数的限制。含虚词的 n 元组和
+        max_length + 1 元组不进入词表，只统计文档频率，用于判断较短的 n 元组是否
+        总是某个更长片段的一部分（如“的话理财”中的“话理财”）。
+        """
+        cleaned = [TAG_PATTERN.sub(' ', text or '') for text in texts]
+        # 以 \0 分隔各文档，n 元组不会跨越文档边界
+        joined = '\0'.join(cleaned) + '\0'
+        codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+        separators = codes == 0
+        doc_of = np.cumsum(separators) - separators
+
+        cjk = np.zeros(len(codes), dtype=bool)
+        for low, high in CJK_RANGES:
+            cjk |= (codes >= low) & (codes <= high)
+        stops_before = np.concatenate([[0], np.cumsum(np.isin(codes, self.stop_codes))])
+
+        doc_parts = []
+        index_parts = []
+        vocabulary = []
+        other_frequencies = []
+        other_count = 0
+        parts = []
+        previous_ids = np.where(cjk, codes, -1)    # 单字的编号就是码点
+        previous_global = None
+        previous_words = None
+        for n in range(2, self.max_length + 2):
+            count = max(0, len(codes) - n + 1)
+            starts = np.flatnonzero((previous_ids[:count] >= 0) & cjk[n - 1:n - 1 + count])
+            prefix_ids = previous_ids[starts]
+            gram_keys, gram_ids = np.unique((prefix_ids << CODE_BITS) | codes[starts + n - 1], return_inverse=True)
+            gram_ids = gram_ids.ravel()
+            # 同一个 n 元组的每次出现组成都相同，取任意一次出现的位置即可
+            sample = np.zeros(len(gram_keys), dtype=np.int64)
+            sample[gram_ids] = starts
+            is_term = stops_before[sample + n] == stops_before[sample]
+            if n > self.max_length:
+                is_term[:] = False
+
+            # 词表中的 n 元组编号为非负数，其余的编号为 -1、-2……，所有词确定后再排到词表之后
+            term_ids = np.cumsum(is_term) - 1 + len(vocabulary)
+            other_ids = np.cumsum(~is_term) - 1
+            global_ids = np.where(is_term, term_ids, -1 - (other_ids + other_count))
+            other_count += int((~is_term).sum())
+
+            occurrence_term = is_term[gram_ids]
+            doc_parts.append(doc_of[starts[occurrence_term]])
+            index_parts.append(global_ids[gram_ids[occurrence_term]])
+            # 其余 n 元组直接统计文档频率
+            other_occurrences = ~occurrence_term
+            level_others = max(1, len(other_ids))
+            pairs = np.unique(doc_of[starts[other_occurrences]] * level_others + other_ids[gram_ids[other_occurrences]])
+            other_frequencies.append(np.bincount(pairs % level_others, minlength=int((~is_term).sum())))
+
+            if n > 2:
+                # 每个 n 元组记录一次 (n 元组, 前缀, 后缀)
+                parts.append(np.stack([global_ids, previous_global[previous_ids[sample]],
+                                       previous_global[previous_ids[sample + 1]]], axis=1))
+
+            prefixes = (gram_keys[is_term] >> CODE_BITS).tolist()
+            lasts = [chr(code) for code in (gram_keys[is_term] & ((1 << CODE_BITS) - 1)).tolist()]
+            if previous_words is None:
+                words = [chr(prefix) + last for prefix, last in zip(prefixes, lasts)]
+            else:
+                words = [previous_words[prefix] + last for prefix, last in zip(prefixes, lasts)]
+            vocabulary.extend(words)
+            previous_words = np.empty(len(gram_keys), dtype=object)
+            previous_words[is_term] = words
+            previous_ids = np.full(len(codes), -1, dtype=np.int64)
+            previous_ids[starts] = gram_ids
+            previous_global = global_ids
+        gram_count = len(vocabulary)
+
+        # 英文/数字词数量少得多，直接用正则切分，按之前的分隔符个数确定所属文档
+        words = [(match.start(), match.group().lower()) for match in ASCII_WORD_PATTERN.finditer(joined)]
+        word_of_doc = np.searchsorted(np.flatnonzero(separators), [start for start, _ in words])
+        word_docs, word_index, word_vocabulary = factorize(
+            [(doc, word) for doc, (_, word) in zip(word_of_doc.tolist(), words)])
+
+        self.term_count = gram_count + len(word_vocabulary)
+        self.other_frequencies = np.concatenate(other_frequencies)
+        parts = np.concatenate(parts) if parts else np.zeros((0, 3), dtype=np.int64)
+        self.parts = np.where(parts >= 0, parts, self.term_count - 1 - parts)
+        doc_index = np.concatenate(doc_parts + [word_docs])
+        term_index = np.concatenate(index_parts + [word_index + gram_count])
+        return doc_index, term_index, vocabulary + word_vocabulary
+
+    def candidates(self, frequencies):
+        """返回可作为关键词的词的布尔数组，frequencies 为本次语料中的文档频率
+
+        n 元组会切出大量跨词的碎片，只保留完整的词：
+        - 包含它的某个更长一字的 n 元组文档频率与它相差不多（不低于 SUBSUMED_RATIO），
+          说明它几乎总是出现在后者之中，不单独作为关键词（如“应急资金”中的“应急资”）；
+        - 更长的 n 元组只有在前缀和后缀都是这种情况时才被看作一个完整的词，否则是
+          一个词加上相邻的字（如“看流动性”）。
+        """
+        frequencies = np.concatenate([frequencies, self.other_frequencies])
+        allowed = np.ones(len(frequencies), dtype=bool)
+        longer, prefix, suffix = self.parts[:, 0], self.parts[:, 1], self.parts[:, 2]
+        inside_prefix = frequencies[longer] >= SUBSUMED_RATIO * frequencies[prefix]
+        inside_suffix = frequencies[longer] >= SUBSUMED_RATIO * frequencies[suffix]
+        allowed[prefix[inside_prefix]] = False
+        allowed[suffix[inside_suffix]] = False
+        allowed[longer[~(inside_prefix & inside_suffix)]] = False
+        return allowed[:self.term_count]
+
+    def containment(self):
+        """返回 (词, 词) 的稀疏矩阵，A 包含 B（B 是 A 的片段）时 [A, B] 非零"""
+        parts = self.parts[self.parts[:, 0] < self.term_count]
+        longer = np.concatenate([parts[:, 0], parts[:, 0]])
+        inner = np.concatenate([parts[:, 1], parts[:, 2]])
+        direct = sparse.csr_matrix((np.ones(len(longer)), (longer, inner)), shape=(self.term_count, self.term_count))
+        # 逐级向下传递，最长的 n 元组也包含所有更短的片段
+        contained = direct
+        step = direct
+        for _ in range(self.max_length - 2):
+            step = step @ direct
+            contained = contained + step
+        return contained.tocsr()
+
+
+class JiebaSegmenter:
+    """使用 jieba 分词，需要另外安装 jieba"""
+    name = 'jieba'
+
+    def __init__(self):
+        import jieba
+        self.jieba = jieba
+
+    def segment(self, texts):
+        doc_terms = []
+        for doc, text in enumerate(texts):
+            for word in self.jieba.lcut(TAG_PATTERN.sub(' ', text or '')):
+                word = word.strip().lower()
+                if len(word) > 1 and not all(ch in STOP_CHARS for ch in word) and (word.isalnum() or not word.isascii()):
+                    doc_terms.append((doc, word))
+        return factorize(doc_terms)
+
+    def candidates(self, frequencies):
+        return np.ones(len(frequencies), dtype=bool)
+
+    def containment(self):
+        """jieba 切出的是互不重叠的词，不需要去掉片段"""
+        return None
+
+
+SEGMENTERS = {"ngram": NgramSegmenter, "jieba": JiebaSegmenter}
+
+
+class DocumentFrequencyStore:
+    """跨运行累计的文档频率，每个文档只计一次"""
+
+    def __init__(self, path=KEYWORDS_PATH, segmenter_name='ngram'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.segmenter_name = segmenter_name
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS documents (
+                segmenter TEXT,
+                doc_key TEXT,
+                PRIMARY KEY (segmenter, doc_key)
+            )''')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS frequencies (
+                segmenter TEXT,
+                term TEXT,
+                count INTEGER,
+                PRIMARY KEY (segmenter, term)
+            )''')
+
+    def close(self):
+        self.conn.close()
+
+    def total_documents(self):
+        return self.conn.execute('SELECT COUNT(*) FROM documents WHERE segmenter = ?',
+                                 (self.segmenter_name,)).fetchone()[0]
+
+    def new_documents(self, keys):
+        """返回布尔数组，标记尚未计入文档频率的文档"""
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS run_documents (position INTEGER, doc_key TEXT)')
+            self.conn.execute('DELETE FROM run_documents')
+            self.conn.executemany('INSERT INTO run_documents VALUES (?, ?)', enumerate(keys))
+            known = [row[0] for row in self.conn.execute(
+                '''SELECT position FROM run_documents JOIN documents
+                   ON documents.doc_key = run_documents.doc_key AND documents.segmenter = ?''',
+                (self.segmenter_name,))]
+        mask = np.ones(len(keys), dtype=bool)
+        mask[known] = False
+        return mask
+
+    def add(self, keys, vocabulary, counts):
+        """计入新文档，counts 为各词在新文档中的文档频率"""
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO documents VALUES (?, ?)',
+                                  ((self.segmenter_name, key) for key in keys))
+            self.conn.executemany(
+                '''INSERT INTO frequencies VALUES (?, ?, ?)
+                   ON CONFLICT (segmenter, term) DO UPDATE SET count = count + excluded.count''',
+                ((self.segmenter_name, vocabulary[i], int(counts[i])) for i in np.flatnonzero(counts)))
+
+    def frequencies(self, vocabulary):
+        """返回词表中各词的累计文档频率数组"""
+        result = np.zeros(len(vocabulary), dtype=np.float64)
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS run_terms (position INTEGER, term TEXT)')
+            self.conn.execute('DELETE FROM run_terms')
+            self.conn.executemany('INSERT INTO run_terms VALUES (?, ?)', enumerate(vocabulary))
+            rows = self.conn.execute(
+                '''SELECT position, count FROM run_terms JOIN frequencies
+                   ON frequencies.term = run_terms.term AND frequencies.segmenter = ?''',
+                (self.segmenter_name,)).fetchall()
+        if rows:
+            positions, counts = zip(*rows)
+            result[list(positions)] = counts
+        return result
+
+
+class CorpusKeywordExtractor:
+    """对一批文档计算 TF-IDF，返回每个文档得分最高的词"""
+
+    def __init__(self, segmenter=None, path=KEYWORDS_PATH, top_k=MAX_KEY_POINTS,
+                 min_df=MIN_DOCUMENT_FREQUENCY):
+        self.segmenter = segmenter or NgramSegmenter()
+        self.store = DocumentFrequencyStore(path, self.segmenter.name) if path else None
+        self.top_k = top_k
+        self.min_df = min_df
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
+    def extract(self, documents):
+        """documents 为 (文档键, 文本) 列表，返回 {文档键: 按得分排序的词列表}"""
+        if not documents:
+            return {}
+        keys = [key for key, _ in documents]
+        doc_index, term_index, vocabulary = self.segmenter.segment([text for _, text in documents])
+        counts = sparse.csr_matrix((np.ones(len(term_index)), (doc_index, term_index)),
+                                   shape=(len(documents), len(vocabulary)))
+        counts.sum_duplicates()
+        presence = counts.copy()
+        presence.data[:] = 1
+
+        # 本次运行的新文档计入累计文档频率，已经统计过的文档不重复计算
+        run_frequencies = np.asarray(presence.sum(axis=0)).ravel()
+        allowed = self.segmenter.candidates(run_frequencies)
+        if self.store is not None:
+            new_mask = self.store.new_documents(keys)
+            new_counts = np.asarray(presence[new_mask].sum(axis=0)).ravel()
+            self.store.add([key for key, new in zip(keys, new_mask) if new], vocabulary, new_counts)
+            frequencies = self.store.frequencies(vocabulary)
+            total = self.store.total_documents()
+        else:
+            frequencies = run_frequencies
+            total = len(documents)
+
+        idf = np.log((1 + total) / (1 + frequencies)) + 1
+        weights = counts
+        weights.data = (1 + np.log(weights.data)) * idf[weights.indices]
+        weights.data[(frequencies[weights.indices] < self.min_df) | ~allowed[weights.indices]] = 0
+
+        # 按 (文档, 得分降序) 排序所有非零项，一次取出每个文档的前若干个候选词
+        rows = np.repeat(np.arange(len(documents)), np.diff(weights.indptr))
+        order = np.lexsort((-weights.data, rows))
+        ranks = np.arange(len(order)) - weights.indptr[rows[order]]
+        selected = order[(ranks < self.top_k * CANDIDATE_FACTOR) & (weights.data[order] > 0)]
+        selected_rows = rows[selected]
+        selected_terms = weights.indices[selected]
+
+        # 同一文档的候选词中被更长的候选词包含的（如“指数基金”中的“基金”）不再单独列出
+        containment = self.segmenter.containment()
+        if containment is not None and len(selected):
+            chosen = sparse.csr_matrix((np.ones(len(selected)), (selected_rows, selected_terms)),
+                                       shape=weights.shape)
+            covered = (chosen @ containment).tocsr()
+            keep = np.asarray(covered[selected_rows, selected_terms]).ravel() == 0
+            selected_rows = selected_rows[keep]
+            selected_terms = selected_terms[keep]
+        ranks = np.arange(len(selected_rows)) - np.searchsorted(selected_rows, selected_rows)
+        top = ranks < self.top_k
+
+        result = {key: [] for key in keys}
+        for row, term in zip(selected_rows[top].tolist(), selected_terms[top].tolist()):
+            result[keys[row]].append(vocabulary[term])
+        return result
+
+    def enrich_posts(self, posts, analyzer, terms=None):
+        """用 TF-IDF 结果补充AI JSON帖子的 tags 和 key_points
+
+        terms 为已经计算过的 {文档键: 词列表}，其中已有的文档不再重复计算。
+        """
+        terms = {} if terms is None else terms
+        documents = []
+        for post in posts:
+            documents.append((doc_key(post["id"], 0), document_text(post["title"] + '\n' + post["summary"])))
+            documents.extend((doc_key(post["id"], comment["floor"]), document_text(comment["content"]))
+                             for comment in post["comments"])
+        terms.update(self.extract([document for document in documents if document[0] not in terms]))
+
+        tag_words = set(analyzer.tag_words)
+        # 词典中的每个关键词占一位；补充的词包含或属于某个已命中的关键词时不再补充
+        key_point_bits = {word: 1 << i for i, word in enumerate(dict.fromkeys(analyzer.key_point_words))}
+        overlap_bits = dictionary_overlaps({word for words in terms.values() for word in words}, key_point_bits)
+
+        def merge_key_points(key_points, extra):
+            # 再次处理时先去掉上次补充的词，结果不会累积
+            merged = [word for word in key_points if word in key_point_bits]
+            hit = 0
+            for word in merged:
+                hit |= key_point_bits[word]
+            merged.extend(word for word in extra if not overlap_bits.get(word, 0) & hit)
+            return merged[:MAX_KEY_POINTS]
+
+        for post in posts:
+            post_terms = terms[doc_key(post["id"], 0)]
+            tags = [tag for tag in post["tags"] if tag in tag_words]
+            post["tags"] = tags or post_terms[:MAX_FALLBACK_TAGS]
+            post["key_points"] = merge_key_points(post["key_points"], post_terms)
+            for comment in post["comments"]:
+                comment["key_points"] = merge_key_points(comment["key_points"],
+                                                         terms[doc_key(post["id"], comment["floor"])])
+        return posts
+
+    def enrich_exports(self, paths, analyzer):
+        """补充AI JSON导出文件中的关键词并原子地写回，返回处理的帖子数"""
+        processed = 0
+        # 同一次导出的多种格式包含相同的帖子，只计算一次
+        terms = {}
+        for path in paths:
+            metadata, posts = load_export(path)
+            self.enrich_posts(posts, analyzer, terms)
+            metadata["keywords"] = {"segmenter": self.segmenter.name,
+                                    "documents": self.store.total_documents() if self.store else None}
+            save_export(path, metadata, posts)
+            processed = max(processed, len(posts))
+        return processed
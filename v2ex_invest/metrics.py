@@ -0,0 +1,163 @@
+"""运行指标：计数器、直方图，Prometheus文本格式导出和结构化JSON日志
+
+无人值守的定时导出（命令行守护模式、界面的定时刷新）通过这里记录各阶段耗时、
+请求延迟、重试、超时、流量和处理的帖子数。指标可以写成 node_exporter 的
+textfile 文件，也可以在本地端口以 /metrics 提供；每次运行的摘要另外以
+JSON Lines 追加到日志文件中。
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_DIR = os.path.join(os.path.expanduser('~'), '.v2ex_invest')
+METRICS_PATH = os.path.join(METRICS_DIR, 'metrics.prom')
+RUN_LOG_PATH = os.path.join(METRICS_DIR, 'runs.jsonl')
+
+METRIC_PREFIX = 'v2ex_invest_'
+# 直方图的桶上限（秒），覆盖单个请求到整次导出的范围
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# 指标名称 -> (类型, 说明)
+METRIC_HELP = {
+    'stage_seconds': ('histogram', '流水线各阶段的耗时'),
+    'http_request_seconds': ('histogram', '单次HTTP请求的耗时'),
+    'http_requests_total': ('counter', 'HTTP请求次数'),
+    'http_response_bytes_total': ('counter', '下载的响应字节数'),
+    'http_retries_total': ('counter', 'HTTP请求重试次数'),
+    'http_retry_backoff_seconds_total': ('counter', '重试前等待的总时间'),
+    'http_timeouts_total': ('counter', 'HTTP请求超时次数'),
+    'http_failures_total': ('counter', '重试后仍然失败的请求数'),
+    'topics_processed_total': ('counter', '处理的帖子数'),
+    'comments_processed_total': ('counter', '处理的评论数'),
+    'reply_cache_hits_total': ('counter', '直接使用本地缓存的帖子数'),
+    'reply_failures_total': ('counter', '评论获取失败的帖子数'),
+    'export_bytes_total': ('counter', '写出的导出文件字节数'),
+    'runs_total': ('counter', '导出运行次数'),
+    'last_run_timestamp_seconds': ('gauge', '最近一次运行结束的时间'),
+    'last_run_duration_seconds': ('gauge', '最近一次运行的耗时'),
+    'last_run_topics': ('gauge', '最近一次运行处理的帖子数'),
+}
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(items, escaped)) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """线程安全的指标注册表，可在多次运行之间共享"""
+
+    def __init__(self, json_log_path=None, buckets=DEFAULT_BUCKETS):
+        self.json_log_path = json_log_path
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.values = {}         # 计数器和仪表：(名称, 标签) -> 数值
+        self.histograms = {}     # (名称, 标签) -> [各桶计数, 总和, 次数]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.values[(name, label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self):
+        """按Prometheus文本格式输出所有指标"""
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: (list(counts), total, count) for key, (counts, total, count) in self.histograms.items()}
+
+        names = sorted({name for name, _ in values} | {name for name, _ in histograms})
+        lines = []
+        for name in names:
+            metric_type, description = METRIC_HELP.get(name, ('untyped', name))
+            full_name = METRIC_PREFIX + name
+            lines.append(f'# HELP {full_name} {description}')
+            lines.append(f'# TYPE {full_name} {metric_type}')
+            for (value_name, key), value in sorted(values.items()):
+                if value_name == name:
+                    lines.append(f'{full_name}{format_labels(key)} {format_value(value)}')
+            for (histogram_name, key), (counts, total, count) in sorted(histograms.items()):
+                if histogram_name != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{full_name}_bucket{format_labels(key, [("le", bound)])} {bucket_count}')
+                lines.append(f'{full_name}_bucket{format_labels(key, [("le", "+Inf")])} {count}')
+                lines.append(f'{full_name}_sum{format_labels(key)} {format_value(total)}')
+                lines.append(f'{full_name}_count{format_labels(key)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path=METRICS_PATH):
+        """写出 node_exporter textfile 格式的文件，先写临时文件再替换，避免被读到一半"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+    def event(self, name, **fields):
+        """向JSON日志追加一条事件，未配置日志文件时忽略"""
+        if not self.json_log_path:
+            return
+        record = {"ts": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "event": name}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            directory = os.path.dirname(self.json_log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.json_log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def serve(self, port, host='127.0.0.1'):
+        """在后台线程中提供 /metrics 接口，返回 HTTP 服务对象（调用 shutdown() 停止）"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,139 @@
+"""帖子和评论的数据模型
+
+获取、分析和导出共用同一组对象：评论在获取线程中就从接口返回的原始字典
+转换为 Comment，之后只保留这一份数据；HTML 和 AI JSON 导出都直接读取它。
+分析结果在第一次访问时计算并缓存在对象上，用户名和标签通过 sys.intern
+共享同一个字符串对象。
+"""
+import re
+import sys
+from dataclasses import dataclass, field
+
+ANONYMOUS = '匿名'
+NO_CONTENT = '无内容'
+MENTIONED_FLOOR_PATTERN = re.compile(r'@#(\d+)')
+
+
+def intern_name(name):
+    return sys.intern(name) if name else name
+
+
+def extract_mentioned_floors(content):
+    """提取@的楼层号"""
+    return [int(match) for match in MENTIONED_FLOOR_PATTERN.findall(content)]
+
+
+@dataclass(slots=True, eq=False)
+class Comment:
+    """一条评论；rendered 为把 @用户名 替换成 @#楼层号 后用于HTML的内容"""
+    floor: int
+    username: str
+    content: str
+    rendered: str
+    mentioned_floors: tuple = ()
+    is_author_comment: bool = False
+    analysis: tuple = field(default=None, repr=False)
+
+    @property
+    def author(self):
+        return self.username if self.username is not None else ANONYMOUS
+
+    def analyze(self, analyzer):
+        """返回 (key_points, sentiment)，只计算一次"""
+        if self.analysis is None:
+            matches = analyzer.match(self.content)
+            self.analysis = (analyzer.key_points(matches), analyzer.sentiment(matches))
+        return self.analysis
+
+    def to_reply(self):
+        """转换为与评论接口格式兼容的精简字典，用于缓存"""
+        reply = {"content": self.content}
+        if self.username is not None:
+            reply["member"] = {"username": self.username}
+        return reply
+
+    def to_ai_dict(self, analyzer):
+        key_points, sentiment = self.analyze(analyzer)
+        return {
+            "floor": self.floor,
+            "author": self.author,
+            "content": self.content,
+            "is_author_comment": self.is_author_comment,
+            "key_points": key_points,
+            "sentiment": sentiment,
+            "mentioned_floors": list(self.mentioned_floors)
+        }
+
+
+@dataclass(slots=True, eq=False)
+class Post:
+    """一个帖子及其评论，analyzer 为计算关键点、情感和标签使用的分析器"""
+    id: str
+    title: str
+    author: str
+    published: str
+    link: str
+    summary: str
+    analyzer: object = field(repr=False)
+    comments: list = field(default_factory=list)
+    analysis: tuple = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.author = intern_name(self.author)
+        # 创建帖子时就标记楼主的评论，各导出格式都不依赖先渲染HTML
+        for comment in self.comments:
+            comment.is_author_comment = comment.username == self.author
+
+    @classmethod
+    def from_dict(cls, data, analyzer):
+        """从帖子字典（导出时收集的数据或已导出的AI JSON帖子）创建"""
+        comments = []
+        for comment in data["comments"]:
+            mentioned_floors = comment.get("mentioned_floors")
+            # 旧数据没有记录提到的楼层，从原文中提取
+            if mentioned_floors is None:
+                mentioned_floors = extract_mentioned_floors(comment["content"])
+            comments.append(Comment(floor=comment["floor"],
+                                    username=intern_name(comment["author"]),
+                                    content=comment["content"],
+                                    rendered=comment["content"],
+                                    mentioned_floors=tuple(mentioned_floors)))
+        return cls(id=data["id"], title=data["title"], author=data["author"], published=data["published"],
+                   link=data["link"], summary=data["summary"], analyzer=analyzer, comments=comments)
+
+    def analyze(self):
+        """返回正文的 (key_points, sentiment, tags)，只计算一次"""
+        if self.analysis is None:
+            analyzer = self.analyzer
+            matches = analyzer.match(self.summary)
+            tags = [sys.intern(tag) for tag in analyzer.tags(self.title, self.summary, matches)]
+            self.analysis = (analyzer.key_points(matches), analyzer.sentiment(matches), tags)
+        return self.analysis
+
+    @property
+    def key_points(self):
+        return self.analyze()[0]
+
+    @property
+    def sentiment(self):
+        return self.analyze()[1]
+
+    @property
+    def tags(self):
+        return self.analyze()[2]
+
+    def to_ai_dict(self):
+        """生成AI JSON格式的帖子字典，只在写出时临时创建"""
+        key_points, sentiment, tags = self.analyze()
+        return {
+            "id": self.id,
+            "title": self.title,
+            "author": self.author,
+            "published": self.published,
+            "link": self.link,
+            "summary": self.summary,
+            "key_points": key_points,
+            "sentiment": sentiment,
+            "tags": tags,
+            "comments": [comment.to_ai_dict(self.analyzer) for comment in self.comments]
+        }
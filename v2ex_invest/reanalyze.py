@@ -0,0 +1,164 @@
+"""批量重新分析已导出的AI JSON文件
+
+修改关键词、情感或标签词典后，不必重新获取帖子：读取已有的 *_ai.json /
+*_ai.jsonl 导出，按块分发到进程池重新计算 key_points、sentiment 和 tags，
+再原子地写回原文件。每个帖子的内容哈希和分析器版本记录在文件元数据的
+analysis 字段中，两者都没变的帖子直接跳过，文件没有变化时不会重写。
+某一块分析失败时保留这些帖子原来的结果，下次运行时重试。
+"""
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .core import DEFAULT_ANALYZER, AiJsonLinesWriter, AiJsonWriter, TextAnalyzer, analyze_post
+
+CHUNK_SIZE = 50              # 每个任务包含的帖子数
+EXPORT_SUFFIXES = ('_ai.json', '_ai.jsonl')
+
+# 工作进程中使用的分析器，由 init_worker 创建
+worker_analyzer = DEFAULT_ANALYZER
+
+
+def init_worker(dictionary_path):
+    global worker_analyzer
+    worker_analyzer = TextAnalyzer.from_file(dictionary_path) if dictionary_path else DEFAULT_ANALYZER
+
+
+def analyze_chunk(posts):
+    """在工作进程中分析一组帖子"""
+    return [analyze_post(post, worker_analyzer) for post in posts]
+
+
+def content_hash(post):
+    """帖子中参与分析的内容的哈希，不含分析结果本身"""
+    content = [post["title"], post["summary"],
+               [[comment["floor"], comment["content"], comment.get("mentioned_floors")]
+                for comment in post["comments"]]]
+    return hashlib.sha1(json.dumps(content, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def find_exports(paths):
+    """展开文件和目录参数，返回其中所有AI JSON导出文件"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.endswith(EXPORT_SUFFIXES))
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def load_export(path):
+    """读取导出文件，返回 (元数据, 帖子列表)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            metadata = json.loads(f.readline())["metadata"]
+            return metadata, [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+        return data["metadata"], data["posts"]
+
+
+def save_export(path, metadata, posts):
+    """用导出时的写入器先写入 .part 临时文件再替换，中途失败不会损坏原文件"""
+    writer = AiJsonLinesWriter(path, metadata) if path.endswith('.jsonl') else AiJsonWriter(path, metadata)
+    try:
+        for post in posts:
+            writer.write_post(post)
+        writer.commit()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+class ExportJob:
+    """一个导出文件的重新分析任务"""
+
+    def __init__(self, path, version, force=False):
+        self.path = path
+        self.version = version
+        self.metadata, self.posts = load_export(path)
+        analysis = self.metadata.get("analysis") or {}
+        self.known = analysis.get("content_hashes", {}) if analysis.get("analyzer_version") == version else {}
+        self.hashes = [content_hash(post) for post in self.posts]
+        # 内容哈希和分析器版本都与上次相同的帖子无需重新分析
+        self.stale = [i for i, (post, digest) in enumerate(zip(self.posts, self.hashes))
+                      if force or self.known.get(str(post["id"])) != digest]
+        self.futures = []
+
+    def submit(self, executor, chunk_size):
+        for start in range(0, len(self.stale), chunk_size):
+            indexes = self.stale[start:start + chunk_size]
+            self.futures.append((indexes, executor.submit(analyze_chunk, [self.posts[i] for i in indexes])))
+
+    def finish(self, log=print):
+        """收集分析结果并在有变化时写回文件，返回 (重新分析的帖子数, 结果有变化的帖子数)
+
+        分析失败的块记录日志后跳过，这些帖子不记录内容哈希，下次运行时重新分析。
+        """
+        changed = 0
+        failed = set()
+        for indexes, future in self.futures:
+            try:
+                ai_posts = future.result()
+            except Exception as e:
+                ids = ', '.join(str(self.posts[i]["id"]) for i in indexes)
+                log(f'{self.path}: 帖子 {ids} 分析失败，保留原结果: {str(e)}')
+                failed.update(indexes)
+                continue
+            for i, ai_post in zip(indexes, ai_posts):
+                if ai_post != self.posts[i]:
+                    self.posts[i] = ai_post
+                    changed += 1
+
+        hashes = {str(post["id"]): digest for i, (post, digest) in enumerate(zip(self.posts, self.hashes))
+                  if i not in failed}
+        analysis = {"analyzer_version": self.version, "content_hashes": hashes}
+        if changed or self.metadata.get("analysis") != analysis:
+            self.metadata["analysis"] = analysis
+            save_export(self.path, self.metadata, self.posts)
+        return len(self.stale) - len(failed), changed
+
+
+def reanalyze(paths, dictionary_path=None, workers=None, chunk_size=CHUNK_SIZE, force=False, log=print):
+    """重新分析 paths 中的所有导出文件，返回 {文件: (重新分析的帖子数, 有变化的帖子数)}
+
+    各文件的任务同时在进程池中排队，池中进程不会因为单个文件较小而空闲；
+    同时保留在内存中的文件数不超过进程数的两倍。
+    """
+    analyzer = TextAnalyzer.from_file(dictionary_path) if dictionary_path else DEFAULT_ANALYZER
+    files = find_exports(paths)
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(dictionary_path,)) as executor:
+        max_pending = workers * 2
+        pending = deque()
+        for path in files:
+            try:
+                job = ExportJob(path, analyzer.version, force)
+            except (OSError, ValueError, KeyError) as e:
+                log(f'跳过无法读取的文件 {path}: {str(e)}')
+                continue
+            job.submit(executor, chunk_size)
+            pending.append(job)
+            while len(pending) > max_pending:
+                finish_job(pending.popleft(), results, log)
+        while pending:
+            finish_job(pending.popleft(), results, log)
+    return results
+
+
+def finish_job(job, results, log):
+    try:
+        analyzed, changed = job.finish(log)
+    except OSError as e:
+        log(f'{job.path}: 写回文件失败: {str(e)}')
+        return
+    results[job.path] = (analyzed, changed)
+    if analyzed:
+        log(f'{job.path}: 重新分析 {analyzed}/{len(job.posts)} 个帖子，{changed} 个结果有变化')
+    elif not job.stale:
+        log(f'{job.path}: 内容和词典均未变化，跳过')
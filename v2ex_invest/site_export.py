@@ -0,0 +1,277 @@
+"""分片加载的网页导出
+
+单个HTML文件在导出范围较大时可达几十MB，浏览器打开和查找都很慢。这里把导出写成
+一个目录：
+
+    index.html      帖子列表，只包含标题和发布时间
+    site.js         加载分片和搜索的脚本
+    shards/NNNN.js  帖子正文和评论，每个分片若干个帖子，滚动到附近时才加载
+    search.js       预先生成的搜索索引（标题、正文和标签的汉字二元组及英文词），
+                    第一次使用搜索框时才加载
+
+分片和索引都是通过 <script> 标签加载的JS文件，直接用 file:// 打开也能使用。
+帖子片段与单文件HTML导出相同，沿用 .post、.comments、.comment-floor、
+.author-comment 等样式。
+"""
+import json
+import os
+import shutil
+
+from .archive import segment_text
+
+SHARD_MAX_POSTS = 20             # 每个分片最多包含的帖子数
+SHARD_MAX_BYTES = 256 * 1024     # 分片大小超过该值时开始新的分片
+
+SITE_STYLES = [
+    '.site-header { margin-bottom: 20px; }',
+    '.site-search { width: 100%; padding: 8px; box-sizing: border-box; font-size: 1em; }',
+    '.site-status { color: #666; font-size: 0.9em; margin-top: 5px; }',
+    '.post[data-shard]:not([data-loaded]) { cursor: pointer; }',
+]
+
+SITE_SCRIPT = r'''(function () {
+  var site = window.V2EX_SITE = {shards: {}, requested: {}, index: null};
+  var posts = document.querySelectorAll('.post[data-shard]');
+  var box = document.getElementById('search');
+  var status = document.getElementById('status');
+
+  function loadScript(src) {
+    var script = document.createElement('script');
+    script.src = src;
+    document.head.appendChild(script);
+  }
+
+  function show(post) {
+    if (post.getAttribute('data-loaded')) {
+      return;
+    }
+    var shard = post.getAttribute('data-shard');
+    if (site.shards[shard]) {
+      post.innerHTML = site.shards[shard][post.getAttribute('data-id')];
+      post.setAttribute('data-loaded', '1');
+    } else if (!site.requested[shard]) {
+      site.requested[shard] = true;
+      loadScript('shards/' + shard + '.js');
+    }
+  }
+
+  site.loadShard = function (shard, content) {
+    site.shards[shard] = content;
+    var nodes = document.querySelectorAll('.post[data-shard="' + shard + '"]');
+    for (var i = 0; i < nodes.length; i++) {
+      show(nodes[i]);
+    }
+  };
+
+  // 与 archive.segment_text 相同的切分：汉字二元组和小写的英文/数字词
+  function terms(text) {
+    var result = [];
+    var pattern = /[㐀-䶿一-鿿豈-﫿]+|[A-Za-z0-9]+/g;
+    var match;
+    while ((match = pattern.exec(text))) {
+      var token = match[0];
+      if (/^[A-Za-z0-9]+$/.test(token)) {
+        result.push(token.toLowerCase());
+      } else if (token.length === 1) {
+        result.push(token);
+      } else {
+        for (var i = 0; i < token.length - 1; i++) {
+          result.push(token.substr(i, 2));
+        }
+      }
+    }
+    return result;
+  }
+
+  function lookup(term) {
+    var hits = {};
+    if (term.length === 1 && !/^[a-z0-9]$/.test(term)) {
+      // 索引中没有单个汉字，只在标题中查找
+      for (var i = 0; i < posts.length; i++) {
+        if (posts[i].getAttribute('data-title').indexOf(term) >= 0) {
+          hits[i] = true;
+        }
+      }
+      return hits;
+    }
+    var list = site.index[term] || [];
+    for (var j = 0; j < list.length; j++) {
+      hits[list[j]] = true;
+    }
+    return hits;
+  }
+
+  function search() {
+    var query = box.value.trim();
+    var matched = null;
+    if (query && !site.index) {
+      status.textContent = '正在加载搜索索引...';
+      return;
+    }
+    var queryTerms = query ? terms(query) : [];
+    for (var i = 0; i < queryTerms.length; i++) {
+      var hits = lookup(queryTerms[i]);
+      if (matched !== null) {
+        for (var key in matched) {
+          if (!hits[key]) {
+            delete matched[key];
+          }
+        }
+      } else {
+        matched = hits;
+      }
+    }
+    var count = 0;
+    for (var k = 0; k < posts.length; k++) {
+      var visible = matched === null || matched[k];
+      posts[k].style.display = visible ? '' : 'none';
+      count += visible ? 1 : 0;
+    }
+    status.textContent = matched === null ? '' : '找到 ' + count + ' 个帖子';
+  }
+
+  site.setSearchIndex = function (index) {
+    site.index = index;
+    search();
+  };
+
+  box.addEventListener('focus', function () {
+    if (!site.requested.search) {
+      site.requested.search = true;
+      loadScript('search.js');
+    }
+  });
+  box.addEventListener('input', search);
+
+  // 帖子滚动到附近时加载所在分片；不支持 IntersectionObserver 的浏览器点击后加载
+  var observer = 'IntersectionObserver' in window ? new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) {
+        observer.unobserve(entry.target);
+        show(entry.target);
+      }
+    });
+  }, {rootMargin: '600px 0px'}) : null;
+  for (var i = 0; i < posts.length; i++) {
+    if (observer) {
+      observer.observe(posts[i]);
+    }
+    posts[i].addEventListener('click', function () {
+      show(this);
+    });
+  }
+})();
+'''
+
+
+def escape_attribute(value):
+    return (str(value).replace('&', '&amp;').replace('"', '&quot;')
+            .replace('<', '&lt;').replace('>', '&gt;'))
+
+
+class SiteExportWriter:
+    """分片网页导出，接口与 core.StreamingWriter 一致
+
+    先写入 <目录>.part，完成后替换正式目录；分片写满即写出，内存中只保留
+    帖子列表和搜索索引。
+    """
+    format_name = 'site'
+
+    def __init__(self, path, title, styles):
+        self.path = path
+        self.part_path = path + '.part'
+        self.title = title
+        self.styles = list(styles)
+        if os.path.exists(self.part_path):
+            shutil.rmtree(self.part_path)
+        os.makedirs(os.path.join(self.part_path, 'shards'))
+        self.entries = []        # 帖子列表中每个帖子的HTML
+        self.index = {}          # 词 -> 帖子序号列表
+        self.shard_number = 0
+        self.shard = {}
+        self.shard_bytes = 0
+
+    def shard_name(self):
+        return f'{self.shard_number:04d}'
+
+    def write_post(self, post, html_lines):
+        """写入一个帖子，html_lines 为单文件HTML导出中该帖子的片段"""
+        position = len(self.entries)
+        # 片段最外层是 <div class="post">，加载后替换占位元素的内容
+        content = '\n'.join(html_lines[1:-1])
+        self.shard[post.id] = content
+        self.shard_bytes += len(content.encode('utf-8'))
+        self.entries.append(
+            f'<div class="post" data-id="{escape_attribute(post.id)}" data-shard="{self.shard_name()}" '
+            f'data-title="{escape_attribute(post.title)}">\n'
+            f'<h2 class="post-title"><a href="{post.link}" target="_blank">{post.title}</a></h2>\n'
+            f'<div class="post-meta">发布于 {post.published} · {len(post.comments)} 条评论</div>\n'
+            f'</div>')
+
+        terms, _ = segment_text(' '.join([post.title, post.summary] + post.tags))
+        for term in dict.fromkeys(terms.split()):
+            self.index.setdefault(term, []).append(position)
+
+        if len(self.shard) >= SHARD_MAX_POSTS or self.shard_bytes >= SHARD_MAX_BYTES:
+            self.flush_shard()
+
+    def flush_shard(self):
+        if not self.shard:
+            return
+        path = os.path.join(self.part_path, 'shards', f'{self.shard_name()}.js')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'V2EX_SITE.loadShard("{self.shard_name()}", '
+                    f'{json.dumps(self.shard, ensure_ascii=False, separators=(",", ":"))});\n')
+        self.shard_number += 1
+        self.shard = {}
+        self.shard_bytes = 0
+
+    def write_index(self):
+        lines = ['<!DOCTYPE html>',
+                 '<html><head><meta charset="utf-8">',
+                 f'<title>{self.title}</title>',
+                 '<style>']
+        lines.extend(self.styles + SITE_STYLES)
+        lines.extend(['</style>',
+                      '</head><body>',
+                      '<div class="site-header">',
+                      f'<h1>{self.title}</h1>',
+                      f'<input id="search" class="site-search" type="search" '
+                      f'placeholder="搜索 {len(self.entries)} 个帖子的标题、正文和标签">',
+                      '<div id="status" class="site-status"></div>',
+                      '</div>'])
+        lines.extend(self.entries)
+        lines.extend(['<script src="site.js"></script>', '</body></html>'])
+        with open(os.path.join(self.part_path, 'index.html'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        with open(os.path.join(self.part_path, 'site.js'), 'w', encoding='utf-8') as f:
+            f.write(SITE_SCRIPT)
+        with open(os.path.join(self.part_path, 'search.js'), 'w', encoding='utf-8') as f:
+            f.write(f'V2EX_SITE.setSearchIndex({json.dumps(self.index, ensure_ascii=False, separators=(",", ":"))});\n')
+
+    def commit(self):
+        """写出最后的分片和帖子列表，再替换正式目录"""
+        self.flush_shard()
+        self.write_index()
+        old_path = self.path + '.old'
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self.part_path, self.path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+    def close(self):
+        """保留已写出的分片"""
+        self.flush_shard()
+
+    def discard(self):
+        if os.path.exists(self.part_path):
+            shutil.rmtree(self.part_path)
+
+    def size(self):
+        total = 0
+        for root, _, names in os.walk(self.path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in names)
+        return total
@@ -0,0 +1,325 @@
+"""共享的HTTP传输层
+
+feed 和评论请求共用一个 requests.Session：连接池保持 keep-alive，首个请求之后
+不再重复 TCP/TLS 握手；统一处理压缩、按主机限速、带抖动的指数退避重试（遵守
+Retry-After）以及每个请求的延迟统计。
+
+V2EX API 按IP限制每小时的请求数，默认速率按该配额设置；响应中的
+X-Rate-Limit-Remaining 降到 0 时暂停该主机的请求直到 X-Rate-Limit-Reset，
+配额用完时返回的 403 也会在重置后重试。
+"""
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = 'v2ex-invest-reader'
+
+REQUEST_TIMEOUT = 5          # 单次请求超时（秒）
+MAX_RETRIES = 3              # 每个请求最多尝试的次数
+RETRY_BACKOFF = 1.0          # 第一次重试前的基础等待时间（秒），之后每次翻倍
+MAX_RETRY_DELAY = 60         # 单次重试等待的上限（秒），也用于限制 Retry-After
+POOL_SIZE = 8                # 每个主机保持的连接数
+HOURLY_QUOTA = 120           # V2EX API 每个IP每小时允许的请求数
+RATE_BURST = 10              # 令牌桶容量，允许的瞬时突发请求数
+# 每秒允许的请求数（每个主机）：突发加上一小时的持续请求不超过每小时配额
+RATE_LIMIT = (HOURLY_QUOTA - RATE_BURST) / 3600
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+QUOTA_STATUS = {403, 429}    # 配额用完时可能返回的状态
+
+
+def quota_rate(requests_per_hour):
+    """把每小时请求数换算为 HttpTransport 的 (rate, burst)，为 None 或 0 时不限速"""
+    if not requests_per_hour:
+        return None, RATE_BURST
+    burst = max(1, min(RATE_BURST, requests_per_hour // 10))
+    return (requests_per_hour - burst) / 3600, burst
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器，rate 为 None 时不限速"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, cancel_event=None):
+        """获取一个令牌，令牌不足或暂停期间阻塞等待；cancel_event 被设置时立即抛出 RequestCancelled"""
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise RequestCancelled('请求已取消')
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate is None:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            if cancel_event is None:
+                time.sleep(wait)
+            else:
+                cancel_event.wait(wait)
+
+    def pause(self, seconds):
+        """在 seconds 秒内不发放令牌，恢复后从空桶开始"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+    def paused_for(self):
+        """返回距暂停结束的秒数"""
+        with self.lock:
+            return max(0.0, self.paused_until - time.monotonic())
+
+
+class TransportStats:
+    """请求次数、重试、失败、流量和延迟的统计"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes = 0
+        self.latencies = []
+
+    def record(self, latency, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+
+    def summary(self):
+        """返回统计摘要，延迟单位为毫秒"""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            result = {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "bytes": self.bytes,
+            }
+        if latencies:
+            result["latency_avg_ms"] = round(sum(latencies) / len(latencies) * 1000, 1)
+            result["latency_p50_ms"] = round(latencies[len(latencies) // 2] * 1000, 1)
+            result["latency_p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+        return result
+
+
+class RetryableStatus(requests.HTTPError):
+    """可以重试的HTTP状态（429、5xx，以及配额用完时的 403）"""
+
+
+class QuotaExhausted(requests.RequestException):
+    """请求配额已用完，且重置时间超过了可以等待的上限"""
+
+
+class RequestCancelled(requests.RequestException):
+    """等待令牌或重试期间任务被取消"""
+
+
+class HttpTransport:
+    """带连接池、限速和重试的HTTP客户端，可在多个线程间共享
+
+    rate 为每个主机每秒允许的请求数，为 None 时不限速（用于本地回放等场景）。
+    cancel_event 被设置后，正在等待令牌或重试的请求立即以 RequestCancelled 结束。
+    """
+
+    def __init__(self, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF,
+                 max_delay=MAX_RETRY_DELAY, pool_size=POOL_SIZE, rate=RATE_LIMIT, burst=RATE_BURST, metrics=None,
+                 cancel_event=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.pool_size = pool_size
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.buckets_lock = threading.Lock()
+        self.stats = TransportStats()
+        # 可选的 metrics.Metrics，按接口路径记录延迟、重试、超时和流量
+        self.metrics = metrics
+        self.cancel_event = cancel_event or threading.Event()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+        })
+
+    def close(self):
+        self.session.close()
+
+    def cancel(self):
+        """取消所有正在等待的请求，之后的请求也不再发送"""
+        self.cancel_event.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_bucket(self, url):
+        """获取URL所属主机的令牌桶"""
+        host = urlparse(url).netloc
+        with self.buckets_lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def update_quota(self, bucket, response):
+        """根据 X-Rate-Limit-* 响应头更新配额，用完时暂停该主机的请求，返回配额是否已用完"""
+        try:
+            remaining = int(response.headers['X-Rate-Limit-Remaining'])
+        except (KeyError, ValueError):
+            return False
+        if remaining > 0:
+            return False
+        try:
+            wait = float(response.headers['X-Rate-Limit-Reset']) - time.time()
+        except (KeyError, ValueError):
+            wait = None
+        if wait is None or wait < 0:
+            # 没有给出重置时间时按 Retry-After 或一个完整的配额周期等待
+            wait = parse_retry_after(response.headers.get('Retry-After'))
+            if wait is None:
+                wait = 3600
+        bucket.pause(wait)
+        return True
+
+    def retry_delay(self, attempt, response=None):
+        """计算第 attempt 次失败后的等待时间：优先遵守 Retry-After，否则指数退避加抖动"""
+        if response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_delay)
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_delay)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def get(self, url, headers=None, parse=None, log=None):
+        """发送GET请求，超时、连接错误、429/5xx 以及 parse 抛出的异常都会重试
+
+        parse 用于在重试范围内解析响应（如 response.json()），返回其结果；
+        不提供时返回响应对象。log(message, level) 用于记录重试信息。最终失败时抛出最后一次的异常；
+        配额用完且重置时间超过 max_delay 时不再发送请求，抛出 QuotaExhausted。
+        """
+        bucket = self.get_bucket(url)
+        path = urlparse(url).path
+        for attempt in range(1, self.max_retries + 1):
+            self.check_quota(bucket, path)
+            response = None
+            bucket.acquire(self.cancel_event)
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                latency = time.perf_counter() - start
+                self.stats.record(latency, len(response.content))
+                if self.metrics is not None:
+                    self.metrics.observe('http_request_seconds', latency, path=path)
+                    self.metrics.inc('http_requests_total', path=path, status=response.status_code)
+                    self.metrics.inc('http_response_bytes_total', len(response.content), path=path)
+                exhausted = self.update_quota(bucket, response)
+                if response.status_code in RETRY_STATUS or (exhausted and response.status_code in QUOTA_STATUS):
+                    raise RetryableStatus(f'HTTP {response.status_code}', response=response)
+                if response.status_code >= 400:
+                    response.raise_for_status()
+                return parse(response) if parse is not None else response
+
+            except requests.HTTPError as e:
+                if not isinstance(e, RetryableStatus):
+                    self.record_failure(path)
+                    raise
+                error = e
+                kind = 'status'
+                reason = f'服务器返回 {response.status_code}'
+
+            except requests.Timeout as e:
+                error = e
+                kind = 'timeout'
+                reason = '请求超时'
+                if self.metrics is not None:
+                    self.metrics.inc('http_timeouts_total', path=path)
+
+            except (requests.ConnectionError, ValueError) as e:
+                error = e
+                kind = 'error'
+                reason = '请求出错'
+
+            if attempt >= self.max_retries:
+                self.record_failure(path)
+                raise error
+            self.check_quota(bucket, path)
+
+            # 配额暂停期间由令牌桶等待，不再叠加退避时间
+            paused = bucket.paused_for()
+            delay = paused if paused else self.retry_delay(attempt, response)
+            self.stats.record_retry()
+            if self.metrics is not None:
+                self.metrics.inc('http_retries_total', path=path, reason=kind)
+                self.metrics.inc('http_retry_backoff_seconds_total', delay)
+                self.metrics.event('http_retry', url=url, reason=kind, attempt=attempt, delay=round(delay, 3))
+            if log is not None:
+                log(f'{reason}，{delay:.1f}秒后重试 ({attempt}/{self.max_retries})...', logging.WARNING)
+            if not paused:
+                # 取消时立即醒来，下一次获取令牌时结束
+                self.cancel_event.wait(delay)
+
+    def check_quota(self, bucket, path):
+        """配额暂停的剩余时间超过 max_delay 时直接失败，不让调用方长时间阻塞"""
+        paused = bucket.paused_for()
+        if paused > self.max_delay:
+            self.record_failure(path)
+            raise QuotaExhausted(f'API请求配额已用完，约 {paused / 60:.0f} 分钟后重置')
+
+    def record_failure(self, path):
+        self.stats.record_failure()
+        if self.metrics is not None:
+            self.metrics.inc('http_failures_total', path=path)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头，支持秒数和HTTP日期两种格式"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())